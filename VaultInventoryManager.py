@@ -2,23 +2,38 @@ import sys
 import os
 import json
 import ctypes
+import sqlite3
+import time
+import threading
 from datetime import datetime
+from difflib import SequenceMatcher
+
+if __name__ == "__main__" and sys.argv[1:2] == ["query"]:
+    # Chế độ dòng lệnh: chạy thẳng trên lõi, không import Qt/watchdog
+    from vault_engine import main
+    sys.exit(main(sys.argv[1:]))
 
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QLineEdit, QListWidget, QTableView, QLabel, QHeaderView,
     QFrame, QAbstractItemView, QPushButton, QStackedWidget,
-    QStatusBar, QFileDialog, QListWidgetItem, QStyle
+    QStatusBar, QFileDialog, QListWidgetItem, QStyle, QDialog,
+    QDateTimeEdit, QTableWidget, QTableWidgetItem, QCheckBox
 )
 from PyQt6.QtCore import (
     Qt, pyqtSignal, QObject, QAbstractTableModel, QSortFilterProxyModel,
-    QTimer, QModelIndex, QSize
+    QTimer, QModelIndex, QSize, QThread, pyqtSlot, QMetaObject, QDateTime
 )
 from PyQt6.QtGui import QColor, QFont, QKeySequence, QAction, QIcon, QPixmap, QPainter
 
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
 
+from vault_engine import (
+    VaultEngine, ItemStore, ItemAggregator, WatchSet, InventoryDatabase,
+    ChangeJournal, HISTORY_RETENTION_DAYS, get_json_backend, PROFILER, format_tsv, export_file
+)
+
 # --- THIẾT LẬP WINDOWS API CHO DARK MODE TITLE BAR ---
 def apply_immersive_dark_mode(window):
     if sys.platform == "win32":
@@ -266,20 +281,208 @@ def create_color_icon(color_hex):
     painter.end()
     return QIcon(pixmap)
 
+# --- SEARCH WORKER ---
+# Tính tập kết quả trên thread riêng; mỗi truy vấn có số thứ tự, truy vấn đã
+# bị thay thế thì bỏ qua luôn (cả khi chưa chạy lẫn khi đã có kết quả).
+class SearchWorker(QObject):
+    results_ready = pyqtSignal(int, str, object, object)
+
+    def __init__(self, search_index):
+        super().__init__()
+        self.search_index = search_index
+        self.latest_seq = 0  # GUI thread ghi, worker thread đọc
+
+    @pyqtSlot(int, str)
+    def run_query(self, seq, query):
+        if seq != self.latest_seq:
+            return
+        name_hits, id_hits = self.search_index.match(query)
+        if seq == self.latest_seq:
+            self.results_ready.emit(seq, query, name_hits, id_hits)
+
 # --- MODEL / VIEW ARCHITECTURE ---
 class VaultTableModel(QAbstractTableModel):
-    def __init__(self, data=None):
+    filters_in_source = False  # True: model tự lọc/sắp xếp (chế độ SQLite)
+    quantity_column = 2
+
+    def __init__(self, store=None):
         super().__init__()
-        self._data = data or []
+        self.store = store if store is not None else ItemStore()
+        self._blocks = []  # [(key, vault_idx, items)] theo đúng thứ tự các dòng trong store
         self._headers = ["Kho chứa", "Vị trí", "Số lượng", "Tên vật phẩm"]
+        self._fg_muted = QColor("#888888")
+        self._fg_name = QColor("#E5E5E5")
+        self._fg_default = QColor("#D4D4D4")
+        self._align_center = Qt.AlignmentFlag.AlignCenter
+        self._align_left = Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter
+        
+        # Phân vùng theo vault: các dòng của một vault luôn liền nhau trong store,
+        # nên chọn một vault chỉ là mở "cửa sổ" [row_offset, row_offset + n).
+        self.vault_ranges = {}  # vault_idx -> (start, end) trong store
+        self._scope = None      # vault_idx đang xem, None = tất cả
+        self.row_offset = 0
+        self._row_count = None  # None = toàn bộ store
+
+    def clear(self):
+        self.beginResetModel()
+        self.store.clear()
+        self._blocks = []
+        self._update_window()
+        self.endResetModel()
 
-    def update_data(self, new_data):
+    def set_vault_scope(self, vault):
+        # Chỉ proxy phải lọc/sắp xếp lại các dòng của vault được chọn
+        scope = self.store.vaults.intern(vault) if vault else None
+        if scope == self._scope:
+            return
         self.beginResetModel()
-        self._data = new_data
+        self._scope = scope
+        self._update_window()
         self.endResetModel()
 
+    def _update_window(self):
+        ranges = {}
+        row = 0
+        for _, vault_idx, items in self._blocks:
+            ranges[vault_idx] = (row, row + len(items))
+            row += len(items)
+        self.vault_ranges = ranges
+        if self._scope is None:
+            self.row_offset = 0
+            self._row_count = None
+        else:
+            start, end = ranges.get(self._scope, (0, 0))
+            self.row_offset = start
+            self._row_count = end - start
+
+    def update_vaults(self, blocks):
+        # blocks: [(key, vault_idx, items)] sắp theo key, items sắp theo slot.
+        # Chỉ phát rowsInserted/rowsRemoved/dataChanged cho đúng các dòng đổi,
+        # nhờ đó view giữ được selection, vị trí cuộn và proxy không phải
+        # lọc/sắp xếp lại toàn bộ.
+        store = self.store
+        if not self._blocks:
+            self.beginResetModel()
+            store.clear()
+            for _, vault_idx, items in blocks:
+                store.append(vault_idx, items)
+            self._blocks = list(blocks)
+            self._update_window()
+            self.endResetModel()
+            return
+
+        old_blocks = self._blocks
+        self._blocks = list(blocks)
+        row = 0
+        i = j = 0
+        while i < len(old_blocks) or j < len(blocks):
+            if i < len(old_blocks) and j < len(blocks) and old_blocks[i][0] == blocks[j][0]:
+                old_items, new_items = old_blocks[i][2], blocks[j][2]
+                if old_items is not new_items:
+                    self._diff_block(row, blocks[j][1], old_items, new_items)
+                row += len(new_items)
+                i += 1
+                j += 1
+            elif j >= len(blocks) or (i < len(old_blocks) and old_blocks[i][0] < blocks[j][0]):
+                # Vault bị xoá
+                _, vault_idx, items = old_blocks[i]
+                if len(items):
+                    visible = self._enter_block(row, vault_idx)
+                    self._remove_rows(row, len(items), visible)
+                i += 1
+            else:
+                # Vault mới
+                _, vault_idx, items = blocks[j]
+                if len(items):
+                    visible = self._enter_block(row, vault_idx)
+                    self._insert_rows(row, vault_idx, items, 0, len(items), visible)
+                row += len(items)
+                j += 1
+        self._update_window()
+
+    def _enter_block(self, start, vault_idx):
+        # Các vault ngoài phạm vi đang xem chỉ cập nhật store, không phát signal
+        if self._scope is None:
+            return True
+        if vault_idx != self._scope:
+            return False
+        self.row_offset = start
+        return True
+
+    def _remove_rows(self, row, n, visible):
+        if visible:
+            first = row - self.row_offset
+            self.beginRemoveRows(QModelIndex(), first, first + n - 1)
+        self.store.remove(row, n)
+        if visible:
+            if self._row_count is not None:
+                self._row_count -= n
+            self.endRemoveRows()
+
+    def _insert_rows(self, row, vault_idx, items, start, end, visible):
+        if visible:
+            first = row - self.row_offset
+            self.beginInsertRows(QModelIndex(), first, first + end - start - 1)
+        self.store.insert(row, vault_idx, items, start, end)
+        if visible:
+            if self._row_count is not None:
+                self._row_count += end - start
+            self.endInsertRows()
+
+    def _diff_block(self, start, vault_idx, old, new):
+        # Merge hai vault đã sắp theo slot, khoá mỗi dòng là (vault, slot)
+        store = self.store
+        visible = self._enter_block(start, vault_idx)
+        old_slots, new_slots = old.slots, new.slots
+        n_old, n_new = len(old), len(new)
+        row = start
+        i = j = 0
+        changed_from = None
+        last_col = len(self._headers) - 1
+
+        def flush_changed(end):
+            nonlocal changed_from
+            if changed_from is not None:
+                if visible:
+                    self.dataChanged.emit(self.index(changed_from - self.row_offset, 0),
+                                          self.index(end - 1 - self.row_offset, last_col))
+                changed_from = None
+
+        while i < n_old or j < n_new:
+            if i < n_old and j < n_new and old_slots[i] == new_slots[j]:
+                if (old.counts[i] != new.counts[j] or old.ids[i] != new.ids[j]
+                        or old.names[i] != new.names[j]):
+                    store.set_row(row, new, j)
+                    if changed_from is None:
+                        changed_from = row
+                else:
+                    flush_changed(row)
+                row += 1
+                i += 1
+                j += 1
+            elif j >= n_new or (i < n_old and old_slots[i] < new_slots[j]):
+                flush_changed(row)
+                k = i
+                while k < n_old and (j >= n_new or old_slots[k] < new_slots[j]):
+                    k += 1
+                self._remove_rows(row, k - i, visible)
+                i = k
+            else:
+                flush_changed(row)
+                k = j
+                while k < n_new and (i >= n_old or new_slots[k] < old_slots[i]):
+                    k += 1
+                self._insert_rows(row, vault_idx, new, j, k, visible)
+                row += k - j
+                j = k
+        flush_changed(row)
+
     def rowCount(self, parent=QModelIndex()):
-        return len(self._data)
+        if parent.isValid():
+            return 0
+        if self._row_count is not None:
+            return self._row_count
+        return len(self.store)
 
     def columnCount(self, parent=QModelIndex()):
         return len(self._headers)
@@ -288,94 +491,766 @@ class VaultTableModel(QAbstractTableModel):
         if not index.isValid():
             return None
         
-        row = index.row()
+        row = index.row() + self.row_offset
         col = index.column()
-        item = self._data[row]
+        store = self.store
 
         if role == Qt.ItemDataRole.DisplayRole:
-            if col == 0: return item.get('vault', '')
-            if col == 1: return f"Slot {item.get('slot', '')}"
-            if col == 2: return int(item.get('count', 0))
-            if col == 3: return item.get('name', '')
+            if col == 0: return store.vaults.strings[store.vault[row]]
+            if col == 1: return store.location(row)
+            if col == 2: return store.count[row]
+            if col == 3: return store.names.strings[store.name[row]]
             
         elif role == Qt.ItemDataRole.ForegroundRole:
             if col == 0:
-                return QColor("#888888")
+                return self._fg_muted
             if col == 2: # Quantity
-                return QColor("#888888")
+                return self._fg_muted
             if col == 3: # Name
-                return QColor("#E5E5E5") # Light text for name, no neon blue
-            return QColor("#D4D4D4")
+                return self._fg_name # Light text for name, no neon blue
+            return self._fg_default
 
         elif role == Qt.ItemDataRole.TextAlignmentRole:
             if col == 1 or col == 2:
-                return Qt.AlignmentFlag.AlignCenter
-            return Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter
+                return self._align_center
+            return self._align_left
 
         return None
 
+    def export_rows(self, source_rows):
+        # Giá trị hiển thị của các dòng, đọc thẳng từ các cột của store
+        store, off = self.store, self.row_offset
+        vaults, names, location = store.vaults.strings, store.names.strings, store.location
+        vault, count, name = store.vault, store.count, store.name
+        return [(vaults[vault[r + off]], location(r + off), count[r + off], names[name[r + off]])
+                for r in source_rows]
+
+    def quantity_sum(self, source_rows):
+        count, off = self.store.count, self.row_offset
+        return sum(count[r + off] for r in source_rows)
+
     def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
         if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
             return self._headers[section]
         return None
 
 class VaultSortFilterProxyModel(QSortFilterProxyModel):
-    def __init__(self):
+    def __init__(self, search_index=None):
         super().__init__()
         self._filter_vault = ""
         self._filter_text = ""
+        self._search_index = search_index
+        self._name_hits = self._id_hits = None
 
     def setFilterVault(self, vault):
+        # Lọc theo vault = thu hẹp cửa sổ của source model, sau đó bộ lọc chữ
+        # chỉ chạy trên các dòng của vault đó
         self._filter_vault = vault
-        self.invalidateFilter()
+        if vault == "TẤT CẢ CÁC KHO":
+            vault = ""
+        with PROFILER.span("filter.vault"):
+            self.sourceModel().set_vault_scope(vault)
 
     def setFilterText(self, text):
+        if self.sourceModel().filters_in_source:
+            self.sourceModel().set_text_filter(text.lower())
+            return
         self._filter_text = text.lower()
+        self.refresh_text_matches()
         self.invalidateFilter()
 
+    def setTextMatches(self, text, name_hits, id_hits):
+        # Kết quả đã tính sẵn từ SearchWorker: áp dụng một lần duy nhất
+        if self.sourceModel().filters_in_source:
+            self.sourceModel().set_text_filter(text)
+            return
+        self._filter_text = text
+        self._name_hits, self._id_hits = name_hits, id_hits
+        with PROFILER.span("filter.text"):
+            self.invalidateFilter()
+
+    def refresh_text_matches(self):
+        # Gọi trước khi nạp dữ liệu mới để các tên/id vừa xuất hiện cũng được lọc đúng
+        if self._filter_text and self._search_index is not None:
+            self._name_hits, self._id_hits = self._search_index.match(self._filter_text)
+        else:
+            self._name_hits = self._id_hits = None
+
     def filterAcceptsRow(self, source_row, source_parent):
         model = self.sourceModel()
-        item = model._data[source_row]
+        if model.filters_in_source:
+            return True
+        store = model.store
+        source_row += model.row_offset
         
-        # 1. Filter by vault
-        if self._filter_vault and self._filter_vault != "TẤT CẢ CÁC KHO":
-            if item.get('vault') != self._filter_vault:
-                return False
-                
-        # 2. Filter by search text
+        # Filter by search text (vault đã được giới hạn bởi set_vault_scope)
+        if self._name_hits is not None:
+            return (store.name[source_row] in self._name_hits
+                    or store.item_id[source_row] in self._id_hits)
         if self._filter_text:
-            name = str(item.get('name', '')).lower()
-            item_id = str(item.get('id', '')).lower()
+            name = store.names.lowered[store.name[source_row]]
+            item_id = store.ids.lowered[store.item_id[source_row]]
             if self._filter_text not in name and self._filter_text not in item_id:
                 return False
                 
         return True
 
+    def sort(self, column, order=Qt.SortOrder.AscendingOrder):
+        source = self.sourceModel()
+        with PROFILER.span("sort", {"column": column}):
+            if source is not None and source.filters_in_source:
+                source.sort(column, order)
+                return
+            super().sort(column, order)
+
+    def lessThan(self, left, right):
+        # So sánh thẳng trên các cột của store, không đi qua data()/QVariant
+        model = self.sourceModel()
+        store = model.store
+        a, b = left.row() + model.row_offset, right.row() + model.row_offset
+        col = left.column()
+        if col == 0:
+            return store.vaults.strings[store.vault[a]] < store.vaults.strings[store.vault[b]]
+        if col == 1:
+            return store.slot[a] < store.slot[b]
+        if col == 2:
+            return store.count[a] < store.count[b]
+        return store.names.strings[store.name[a]] < store.names.strings[store.name[b]]
+
+class SqliteVaultTableModel(VaultTableModel):
+    # Chế độ SQLite: chỉ giữ các trang đã nạp, lọc/sắp xếp được đẩy xuống câu
+    # truy vấn nên proxy chỉ còn chuyển tiếp.
+    filters_in_source = True
+    page_size = 500
+
+    def __init__(self, database, vaults=None):
+        super().__init__()
+        self.database = database
+        self.vaults = vaults if vaults is not None else self.store.vaults  # Bảng tên vault của vault_idx
+        self._synced = {}  # key -> items của lần update_vaults trước
+        self._rows = []
+        self._total = 0
+        self._vault = ""
+        self._text = ""
+        self._sort_column = -1
+        self._descending = False
+
+    def reload(self):
+        self.beginResetModel()
+        try:
+            self._total = self.database.count(self._vault, self._text)
+            self._rows = self.database.fetch(self._vault, self._text, self._sort_column,
+                                             self._descending, 0, self.page_size)
+        except sqlite3.Error as e:
+            print(f"Lỗi truy vấn CSDL: {e}")
+            self._total, self._rows = 0, []
+        self.endResetModel()
+
+    def clear(self):
+        self.beginResetModel()
+        self._rows, self._total = [], 0
+        self._synced = {}
+        self.endResetModel()
+
+    def update_vaults(self, blocks):
+        # CSDL đã được loader cập nhật trước khi snapshot tới GUI. Chỉ truy vấn lại
+        # khi có vault đổi trong phạm vi đang xem, và khi đó cũng chỉ phát tín hiệu
+        # cho các dòng khác đi: không reset model (mất các trang đã nạp, selection,
+        # vị trí cuộn) mỗi lần file log được ghi.
+        current = {key: items for key, _, items in blocks}
+        changed = {self.vaults.strings[vault_idx] for key, vault_idx, items in blocks
+                   if self._synced.get(key) is not items}
+        first = not self._synced
+        if len(current) != len(self._synced) or not current.keys() <= self._synced.keys():
+            changed.add(None)  # Có vault bị xoá/thêm: không biết tên cũ, coi như đổi hết
+        self._synced = current
+        if first:
+            self.reload()
+            return
+        if not changed or (self._vault and None not in changed and self._vault not in changed):
+            return
+        self.refresh_rows()
+
+    def refresh_rows(self):
+        # Nạp lại đúng số dòng đang có rồi so khớp theo (vault, slot)
+        try:
+            total = self.database.count(self._vault, self._text)
+            rows = self.database.fetch(self._vault, self._text, self._sort_column,
+                                       self._descending, 0, max(len(self._rows), self.page_size))
+        except sqlite3.Error as e:
+            print(f"Lỗi truy vấn CSDL: {e}")
+            return
+        old = self._rows
+        self._rows = list(old)
+        start = 0
+        while start < len(old) and start < len(rows) and old[start] == rows[start]:
+            start += 1
+        end_old, end_new = len(old), len(rows)
+        while end_old > start and end_new > start and old[end_old - 1] == rows[end_new - 1]:
+            end_old -= 1
+            end_new -= 1
+        self._total = total
+        if start == end_old and start == end_new:
+            return
+        matcher = SequenceMatcher(None, [r[:2] for r in old[start:end_old]],
+                                  [r[:2] for r in rows[start:end_new]], autojunk=False)
+        # Áp từ cuối lên để chỉ số của các đoạn phía trước không bị lệch
+        for tag, i1, i2, j1, j2 in reversed(matcher.get_opcodes()):
+            i1, i2, j1, j2 = i1 + start, i2 + start, j1 + start, j2 + start
+            if tag == 'equal':
+                changed = [k for k in range(i2 - i1) if old[i1 + k] != rows[j1 + k]]
+                if changed:
+                    self._rows[i1:i2] = rows[j1:j2]
+                    self.dataChanged.emit(self.index(i1 + changed[0], 0),
+                                          self.index(i1 + changed[-1], self.columnCount() - 1))
+                continue
+            if i2 > i1:
+                self.beginRemoveRows(QModelIndex(), i1, i2 - 1)
+                del self._rows[i1:i2]
+                self.endRemoveRows()
+            if j2 > j1:
+                self.beginInsertRows(QModelIndex(), i1, i1 + j2 - j1 - 1)
+                self._rows[i1:i1] = rows[j1:j2]
+                self.endInsertRows()
+
+    def set_vault_scope(self, vault):
+        self._vault = vault
+        self.reload()
+
+    def set_text_filter(self, text):
+        self._text = text
+        self.reload()
+
+    def sort(self, column, order=Qt.SortOrder.AscendingOrder):
+        self._sort_column = column
+        self._descending = order == Qt.SortOrder.DescendingOrder
+        self.reload()
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and len(self._rows) < self._total
+
+    def fetchMore(self, parent=QModelIndex()):
+        start = len(self._rows)
+        try:
+            page = self.database.fetch(self._vault, self._text, self._sort_column,
+                                       self._descending, start, self.page_size)
+        except sqlite3.Error as e:
+            print(f"Lỗi truy vấn CSDL: {e}")
+            return
+        if not page:
+            self._total = start
+            return
+        self.beginInsertRows(QModelIndex(), start, start + len(page) - 1)
+        self._rows.extend(page)
+        self.endInsertRows()
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self._rows)
+
+    def export_rows(self, source_rows):
+        rows = self._rows
+        return [(rows[r][0], f"Slot {rows[r][1]}", rows[r][2], rows[r][3]) for r in source_rows]
+
+    def quantity_sum(self, source_rows):
+        rows = self._rows
+        return sum(rows[r][2] for r in source_rows)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and index.isValid():
+            vault, slot, count, name = self._rows[index.row()]
+            col = index.column()
+            if col == 0: return vault
+            if col == 1: return f"Slot {slot}"
+            if col == 2: return count
+            return name
+        return super().data(index, role)
+
+class ItemTotalsModel(QAbstractTableModel):
+    filters_in_source = False
+    quantity_column = 2
+
+    def __init__(self, store):
+        super().__init__()
+        self.store = store
+        self.aggregator = ItemAggregator()
+        self._ids = []     # id_idx theo thứ tự dòng
+        self._row_of = {}  # id_idx -> dòng
+        self._headers = ["ID vật phẩm", "Tên vật phẩm", "Tổng số lượng", "Số kho", "Số ô"]
+        self._fg_muted = QColor("#888888")
+        self._fg_name = QColor("#E5E5E5")
+        self._fg_default = QColor("#D4D4D4")
+
+    def clear(self):
+        self.beginResetModel()
+        self.aggregator.clear()
+        self._ids = []
+        self._row_of = {}
+        self.endResetModel()
+
+    def update_vaults(self, blocks):
+        changed = self.aggregator.update(blocks)
+        if not changed:
+            return
+        totals = self.aggregator.totals
+
+        gone = sorted((self._row_of[i] for i in changed if i in self._row_of and i not in totals), reverse=True)
+        for row in gone:
+            self.beginRemoveRows(QModelIndex(), row, row)
+            del self._ids[row]
+            self.endRemoveRows()
+        if gone:
+            self._row_of = {id_idx: row for row, id_idx in enumerate(self._ids)}
+
+        for id_idx in changed:
+            row = self._row_of.get(id_idx)
+            if row is not None:
+                self.dataChanged.emit(self.index(row, 0), self.index(row, len(self._headers) - 1))
+
+        added = [i for i in changed if i in totals and i not in self._row_of]
+        if added:
+            start = len(self._ids)
+            self.beginInsertRows(QModelIndex(), start, start + len(added) - 1)
+            for offset, id_idx in enumerate(added):
+                self._row_of[id_idx] = start + offset
+            self._ids.extend(added)
+            self.endInsertRows()
+
+    def id_at(self, row):
+        return self._ids[row]
+
+    def sort_key(self, row, col):
+        id_idx = self._ids[row]
+        if col == 0:
+            return self.store.ids.strings[id_idx]
+        if col == 1:
+            return self.store.names.strings[self.aggregator.names[id_idx]]
+        total, slots, vaults = self.aggregator.totals[id_idx]
+        return (total, vaults, slots)[col - 2]
+
+    def export_rows(self, source_rows):
+        ids, names = self.store.ids.strings, self.store.names.strings
+        totals, item_names = self.aggregator.totals, self.aggregator.names
+        rows = []
+        for r in source_rows:
+            id_idx = self._ids[r]
+            total, slots, vaults = totals[id_idx]
+            rows.append((ids[id_idx], names[item_names[id_idx]], total, vaults, slots))
+        return rows
+
+    def quantity_sum(self, source_rows):
+        totals = self.aggregator.totals
+        return sum(totals[self._ids[r]][0] for r in source_rows)
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self._ids)
+
+    def columnCount(self, parent=QModelIndex()):
+        return len(self._headers)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        col = index.column()
+        if role == Qt.ItemDataRole.DisplayRole:
+            return self.sort_key(index.row(), col)
+        elif role == Qt.ItemDataRole.ForegroundRole:
+            if col == 1:
+                return self._fg_name
+            if col == 0:
+                return self._fg_muted
+            return self._fg_default
+        elif role == Qt.ItemDataRole.TextAlignmentRole:
+            if col >= 2:
+                return Qt.AlignmentFlag.AlignCenter
+            return Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter
+        return None
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+            return self._headers[section]
+        return None
+
+class ItemTotalsProxyModel(VaultSortFilterProxyModel):
+    # Dùng lại bộ lọc chữ (SearchIndex) của bảng chi tiết, lọc theo id/tên của nhóm
+    def filterAcceptsRow(self, source_row, source_parent):
+        model = self.sourceModel()
+        id_idx = model.id_at(source_row)
+        name_idx = model.aggregator.names[id_idx]
+        if self._name_hits is not None:
+            return id_idx in self._id_hits or name_idx in self._name_hits
+        if self._filter_text:
+            store = model.store
+            return (self._filter_text in store.ids.lowered[id_idx]
+                    or self._filter_text in store.names.lowered[name_idx])
+        return True
+
+    def lessThan(self, left, right):
+        model = self.sourceModel()
+        col = left.column()
+        return model.sort_key(left.row(), col) < model.sort_key(right.row(), col)
+
+# --- EXPORT WORKER ---
+# Định dạng / ghi file cho các vùng chọn lớn ngoài GUI thread. Dòng dữ liệu đã
+# được đọc sẵn từ store trên GUI thread (store chỉ đổi trên GUI thread), worker
+# chỉ còn nối chuỗi / ghi file nên không đụng tới model.
+BULK_EXPORT_THREAD_ROWS = 20000
+
+class ExportWorker(QObject):
+    finished = pyqtSignal(int, str, object)  # (seq, đích: "" = clipboard / đường dẫn file, kết quả)
+    failed = pyqtSignal(int, str, str)
+
+    @pyqtSlot(int, str, object, object)
+    def run_export(self, seq, target, columns, rows):
+        try:
+            with PROFILER.span("export", {"rows": len(rows), "target": target or "clipboard"}):
+                if target:
+                    export_file(target, columns, rows, excel_bom=True)
+                    result = len(rows)
+                else:
+                    result = format_tsv(columns, rows)
+        except (OSError, RuntimeError, ValueError) as e:
+            self.failed.emit(seq, target, str(e))
+            return
+        self.finished.emit(seq, target, result)
+
+# --- LOADER: PARSE FILE VAULT NGOÀI GUI THREAD ---
+# Sống trên một QThread riêng, các file cần parse được chia cho thread pool.
+# Mỗi yêu cầu mang một generation; yêu cầu cũ bị bỏ ngay khi có yêu cầu mới
+# hơn, chỉ kết quả của generation mới nhất được gửi về GUI.
+class VaultLoader(QObject):
+    snapshots_ready = pyqtSignal(int, object)
+
+    def __init__(self, engine):
+        super().__init__()
+        self.engine = engine
+        self.latest_generation = 0  # GUI thread ghi, loader thread đọc
+        self._forced_paths = set()
+        self._watch = None
+        self._rescan = True
+        self._retry_timer = QTimer(self)  # Di chuyển sang loader thread cùng self
+        self._retry_timer.setSingleShot(True)
+        self._retry_timer.timeout.connect(self._retry_incomplete)
+        self._persist_timer = QTimer(self)
+        self._persist_timer.setSingleShot(True)
+        self._persist_timer.setInterval(3000)
+        self._persist_timer.timeout.connect(self._save_persisted)
+
+    @pyqtSlot(int, object, list, bool)
+    def load(self, generation, watch, changed_paths, full):
+        # Gộp các file được báo đổi của yêu cầu bị huỷ vào yêu cầu kế tiếp.
+        # Không có danh sách file (lần đầu, đổi thư mục, F5) -> quét lại toàn bộ.
+        self._forced_paths.update(changed_paths)
+        self._rescan = self._rescan or full or not changed_paths or watch is not self._watch
+        self._watch = watch
+        self.engine.prepare(full)
+        if generation != self.latest_generation:
+            return
+
+        try:
+            with PROFILER.span("reload", {"generation": generation, "files": len(self._forced_paths)}):
+                snapshots = self.engine.refresh(watch, self._forced_paths, self._rescan,
+                                                lambda: generation != self.latest_generation)
+        except OSError as e:
+            print(f"Lỗi đọc thư mục vault: {e}")
+            return
+        if snapshots is None:
+            return
+
+        self._forced_paths.clear()
+        self._rescan = False
+        self.snapshots_ready.emit(generation, snapshots)
+
+        delay = self.engine.next_retry_delay()
+        if delay is not None:
+            self._retry_timer.start(delay)
+        if self.engine.dirty and self.engine.persist_path:
+            self._persist_timer.start()
+
+    @pyqtSlot()
+    def _save_persisted(self):
+        self.engine.save()
+
+    @pyqtSlot()
+    def _retry_incomplete(self):
+        if self._watch is not None:
+            self.load(self.latest_generation, self._watch, self.engine.pending_paths(), False)
+
+    @pyqtSlot()
+    def shutdown(self):
+        # Chạy trên loader thread (timer chỉ dừng được trên thread sở hữu nó)
+        self._retry_timer.stop()
+        self._persist_timer.stop()
+        self.engine.close()
+
 # --- WATCHDOG: DEBOUNCED THEO DÕI FILE ---
 class LogWatcherHandler(FileSystemEventHandler, QObject):
-    file_changed = pyqtSignal()
+    file_changed = pyqtSignal(list)
+    # Watchdog gọi on_* từ thread của Observer, còn QTimer chỉ start được trên
+    # thread sở hữu nó -> chuyển sự kiện về GUI thread qua queued signal.
+    _path_event = pyqtSignal(str)
 
-    def __init__(self):
+    def __init__(self, watch):
         super().__init__()
+        self.watch = watch
         self.timer = QTimer()
         self.timer.setSingleShot(True)
         self.timer.timeout.connect(self._emit_signal)
         self.debounce_ms = 200
+        self._pending_paths = set()
+        self.last_event = {}  # path (normcase) -> time.monotonic() của sự kiện native gần nhất
+        self._path_event.connect(self._queue_path)
+
+    def _report(self, path, is_directory):
+        # Thư mục chỉ quan trọng khi bị xoá / đổi tên (loader sẽ quét lại)
+        if is_directory or self.watch.matches(path):
+            self._path_event.emit(path)
 
     def on_modified(self, event):
-        if event.src_path.endswith(".json"):
-            self.timer.start(self.debounce_ms)
+        if not event.is_directory:
+            self._report(event.src_path, False)
 
     def on_created(self, event):
-        if event.src_path.endswith(".json"):
-            self.timer.start(self.debounce_ms)
-            
+        if not event.is_directory:
+            self._report(event.src_path, False)
+
+    def on_deleted(self, event):
+        self._report(event.src_path, event.is_directory)
+
+    def on_moved(self, event):
+        self._report(event.src_path, event.is_directory)
+        self._report(event.dest_path, event.is_directory)
+
+    def _queue_path(self, path):
+        # Nhiều sự kiện liên tiếp của cùng một file gộp thành một lần đọc
+        self._pending_paths.add(path)
+        self.last_event[os.path.normcase(path)] = time.monotonic()
+        PROFILER.count("watch.events")
+        self.timer.start(self.debounce_ms)
+
     def _emit_signal(self):
-        self.file_changed.emit()
+        paths = sorted(self._pending_paths)
+        self._pending_paths.clear()
+        self.file_changed.emit(paths)
+
+# --- POLLING: THEO DÕI BẰNG STAT ---
+# Trên ổ mạng, bind mount, volume container... backend native của watchdog hay
+# mất sự kiện. PollingWatcher quét bằng os.scandir và so (mtime_ns, size, inode)
+# với snapshot thư mục lần trước. Chu kỳ quét tự giãn khi không có gì đổi và
+# co lại ngay khi thấy thay đổi. Chạy trên thread riêng (start/stop/join giống
+# Observer); kết quả về GUI thread qua signal (queued vì phát từ thread khác).
+class PollingWatcher(QObject):
+    changes_detected = pyqtSignal(list, float)  # (đường dẫn đổi, lúc bắt đầu lần quét trước)
+
+    def __init__(self, watch, min_interval=0.5, max_interval=5.0):
+        super().__init__()
+        self.watch = watch
+        self.set_intervals(min_interval, max_interval)
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="vault-poll", daemon=True)
+
+    def set_intervals(self, min_interval, max_interval):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval = min_interval
+
+    def snapshot(self):
+        state = {}
+        for entry in self.watch.scan_entries():
+            try:
+                st = entry.stat()
+                # Trên Windows entry.stat() luôn trả st_ino = 0; inode() thì stat thật (một
+                # system call/file, chỉ lần đầu), còn POSIX lấy sẵn d_ino từ scandir
+                inode = entry.inode()
+            except OSError:
+                continue  # Bị xoá giữa scandir và stat
+            # Key normcase để so giữa các lần quét, nhưng báo ra đường dẫn gốc (giữ hoa/thường)
+            state[os.path.normcase(entry.path)] = (st.st_mtime_ns, st.st_size, inode, entry.path)
+        return state
+
+    def _run(self):
+        # Thay đổi thấy ở lần quét này có thể xảy ra ngay sau khi lần quét trước
+        # đọc tới file đó, nên mốc "since" là lúc lần quét trước *bắt đầu*
+        scanned_at = time.monotonic()
+        previous = self.snapshot()
+        while not self._stop_event.wait(self.interval):
+            now = time.monotonic()
+            current = self.snapshot()
+            changed = [sig[3] for p, sig in current.items() if previous.get(p) != sig]
+            changed.extend(sig[3] for p, sig in previous.items() if p not in current)
+            if changed:
+                self.changes_detected.emit(sorted(changed), scanned_at)
+                self.interval = self.min_interval
+            else:
+                self.interval = min(self.interval * 1.5, self.max_interval)
+            # Cây thư mục lớn / ổ chậm: không để việc quét chiếm quá ~20% thời gian
+            self.interval = max(self.interval, (time.monotonic() - now) * 4)
+            previous, scanned_at = current, now
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def join(self):
+        self._thread.join()
+
+# --- HỘP THOẠI LỊCH SỬ ---
+class HistoryDialog(QDialog):
+    def __init__(self, journal, parent=None):
+        super().__init__(parent)
+        self.journal = journal
+        self.setWindowTitle("Lịch sử tồn kho")
+        self.resize(760, 520)
+        
+        layout = QVBoxLayout(self)
+        controls = QHBoxLayout()
+        self.time_edit = QDateTimeEdit(QDateTime.currentDateTime().addSecs(-3600))
+        self.time_edit.setCalendarPopup(True)
+        self.time_edit.setDisplayFormat("dd/MM/yyyy HH:mm:ss")
+        btn_state = QPushButton("Tồn kho tại thời điểm")
+        btn_state.clicked.connect(self.show_state_at)
+        btn_change = QPushButton("Thay đổi trong 1 giờ qua")
+        btn_change.clicked.connect(self.show_last_hour)
+        controls.addWidget(self.time_edit)
+        controls.addWidget(btn_state)
+        controls.addStretch()
+        controls.addWidget(btn_change)
+        
+        self.lbl_summary = QLabel("")
+        self.result_table = QTableWidget()
+        self.result_table.verticalHeader().setVisible(False)
+        self.result_table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.result_table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.result_table.horizontalHeader().setStretchLastSection(True)
+        
+        layout.addLayout(controls)
+        layout.addWidget(self.lbl_summary)
+        layout.addWidget(self.result_table)
+
+    def _fill(self, headers, rows):
+        self.result_table.setSortingEnabled(False)
+        self.result_table.clear()
+        self.result_table.setColumnCount(len(headers))
+        self.result_table.setHorizontalHeaderLabels(headers)
+        self.result_table.setRowCount(len(rows))
+        for r, row in enumerate(rows):
+            for c, value in enumerate(row):
+                cell = QTableWidgetItem()
+                cell.setData(Qt.ItemDataRole.DisplayRole, value)
+                self.result_table.setItem(r, c, cell)
+        self.result_table.setSortingEnabled(True)
+
+    def show_state_at(self):
+        ts = self.time_edit.dateTime().toMSecsSinceEpoch()
+        state = self.journal.state_at(ts)
+        rows = sorted((vault, f"Slot {slot}", count, name)
+                      for (vault, slot), (item_id, name, count) in state.items())
+        self.lbl_summary.setText(f"{len(rows)} ô có vật phẩm tại {self.time_edit.text()}")
+        self._fill(["Kho chứa", "Vị trí", "Số lượng", "Tên vật phẩm"], rows)
+
+    def show_last_hour(self):
+        changes = self.journal.net_change(int(time.time() * 1000) - 3600 * 1000)
+        self.lbl_summary.setText(f"{len(changes)} vật phẩm thay đổi trong 1 giờ qua")
+        self._fill(["ID vật phẩm", "Tên vật phẩm", "Thay đổi"], [list(c) for c in changes])
+
+# --- BẢNG CHẨN ĐOÁN HIỆU NĂNG ---
+class InstrumentedTableView(QTableView):
+    # Đo thời gian vẽ lại bảng (chỉ tốn thêm một lần gọi khi profiler tắt)
+    def paintEvent(self, event):
+        with PROFILER.span("view.paint"):
+            super().paintEvent(event)
+
+class DiagnosticsDialog(QDialog):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Chẩn đoán hiệu năng")
+        self.resize(720, 520)
+        
+        layout = QVBoxLayout(self)
+        controls = QHBoxLayout()
+        self.chk_enabled = QCheckBox("Bật đo hiệu năng")
+        self.chk_enabled.setChecked(PROFILER.enabled)
+        self.chk_enabled.toggled.connect(self.set_enabled)
+        btn_clear = QPushButton("Xoá số liệu")
+        btn_clear.clicked.connect(self.clear)
+        btn_export = QPushButton("Xuất Chrome trace...")
+        btn_export.clicked.connect(self.export_trace)
+        controls.addWidget(self.chk_enabled)
+        controls.addStretch()
+        controls.addWidget(btn_clear)
+        controls.addWidget(btn_export)
+        
+        self.lbl_counters = QLabel("")
+        self.lbl_counters.setWordWrap(True)
+        self.stats_table = QTableWidget()
+        self.stats_table.verticalHeader().setVisible(False)
+        self.stats_table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.stats_table.setColumnCount(5)
+        self.stats_table.setHorizontalHeaderLabels(["Span", "Số lần", "Tổng (ms)", "TB (ms)", "Lớn nhất (ms)"])
+        self.stats_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+        
+        layout.addLayout(controls)
+        layout.addWidget(self.lbl_counters)
+        layout.addWidget(self.stats_table)
+        
+        # Chỉ làm mới khi bảng đang mở
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setInterval(1000)
+        self.refresh_timer.timeout.connect(self.refresh)
+        self.refresh()
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.refresh_timer.start()
+
+    def hideEvent(self, event):
+        self.refresh_timer.stop()
+        super().hideEvent(event)
+
+    def set_enabled(self, enabled):
+        PROFILER.enabled = enabled
+        self.refresh()
+
+    def clear(self):
+        PROFILER.clear()
+        self.refresh()
+
+    def refresh(self):
+        rows, counters = PROFILER.summary()
+        if counters:
+            self.lbl_counters.setText("   ".join(f"{name}: {value}" for name, value in sorted(counters.items())))
+        else:
+            self.lbl_counters.setText("Chưa có số liệu." if PROFILER.enabled else "Đang tắt đo hiệu năng.")
+        self.stats_table.setRowCount(len(rows))
+        for r, row in enumerate(rows):
+            for c, value in enumerate(row):
+                text = value if c == 0 else (str(value) if c == 1 else f"{value:.2f}")
+                cell = self.stats_table.item(r, c)
+                if cell is None:
+                    cell = QTableWidgetItem()
+                    self.stats_table.setItem(r, c, cell)
+                cell.setText(text)
+
+    def export_trace(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Xuất Chrome trace", "vault_trace.json", "JSON (*.json)")
+        if path:
+            try:
+                PROFILER.export(path)
+            except OSError as e:
+                self.lbl_counters.setText(f"Lỗi ghi file: {e}")
 
 # --- GIAO DIỆN CHÍNH ---
 class VaultManagerApp(QMainWindow):
-    def __init__(self):
+    load_requested = pyqtSignal(int, object, list, bool)
+    search_requested = pyqtSignal(int, str)
+    export_requested = pyqtSignal(int, str, object, object)
+
+    def __init__(self, config_dir=None):
         super().__init__() # Phải gọi ông này đầu tiên để khởi tạo cửa sổ nhé! 🚀
         
         # 1. Xử lý đường dẫn Icon động (để chạy được trên mọi máy)
@@ -393,6 +1268,7 @@ class VaultManagerApp(QMainWindow):
         self.setWindowTitle("VAULT INVENTORY")
         self.resize(1150, 750)
         self.log_path = ""
+        self.watch_set = None
         
         # UI Icons (Các icon hệ thống có sẵn)
         self.icon_folder = QApplication.style().standardIcon(QStyle.StandardPixmap.SP_DirIcon)
@@ -402,14 +1278,93 @@ class VaultManagerApp(QMainWindow):
         
         self.vault_icon = create_color_icon("#4F7DF3")
         
+        # Config (nằm cạnh file chạy, trừ khi được chỉ định - vd. benchmark)
+        if config_dir:
+            os.makedirs(config_dir, exist_ok=True)
+        elif getattr(sys, 'frozen', False):
+            config_dir = os.path.dirname(sys.executable)
+        else:
+            config_dir = os.path.dirname(os.path.abspath(__file__))
+        self.config_file = os.path.join(config_dir, "config.json")
+        config_data = self.load_config()
+        PROFILER.enabled = bool(config_data.get("profiling", False))
+        self.diagnostics_dialog = None
+        
+        # Lõi dữ liệu (vault_engine) dùng chung với chế độ dòng lệnh; GUI chỉ
+        # là lớp model/view bọc bên ngoài
+        self.database_path = ""
+        if config_data.get("storage") == "sqlite":
+            self.database_path = os.path.join(config_dir, "vault_inventory.db")
+        # "history": false tắt hẳn nhật ký; "history_days" = số ngày lịch sử giữ lại
+        journal = None
+        if config_data.get("history", True):
+            journal = ChangeJournal(os.path.join(config_dir, "history"),
+                                    config_data.get("history_days", HISTORY_RETENTION_DAYS))
+        self.engine = VaultEngine(
+            persist_path=os.path.join(config_dir, "vault_cache.bin"),
+            journal=journal,
+            database=InventoryDatabase(self.database_path) if self.database_path else None)
+        
         # Model
-        self.source_model = VaultTableModel()
-        self.proxy_model = VaultSortFilterProxyModel()
+        self.store = self.engine.store
+        if self.database_path:
+            self.source_model = SqliteVaultTableModel(InventoryDatabase(self.database_path), self.store.vaults)
+        else:
+            self.source_model = VaultTableModel(self.store)
+        self.search_index = self.engine.index
+        self.proxy_model = VaultSortFilterProxyModel(self.search_index)
         self.proxy_model.setSourceModel(self.source_model)
         self.proxy_model.setSortRole(Qt.ItemDataRole.DisplayRole)
         self.proxy_model.setDynamicSortFilter(True)
         
+        # Chế độ bảng thứ hai: tổng theo từng ID vật phẩm trên mọi vault
+        self.totals_model = ItemTotalsModel(self.store)
+        self.totals_proxy = ItemTotalsProxyModel(self.search_index)
+        self.totals_proxy.setSourceModel(self.totals_model)
+        self.totals_proxy.setDynamicSortFilter(True)
+        
         self.observer = None
+        self.poller = None
+        self._polling = False     # True: đang dùng PollingWatcher thay cho sự kiện native
+        self._missed_polls = 0
+        
+        # Loader chạy trên thread riêng, model chỉ được cập nhật trên GUI thread
+        self._load_generation = 0
+        self.loader_thread = QThread()
+        self.loader = VaultLoader(self.engine)
+        self.loader.moveToThread(self.loader_thread)
+        self.load_requested.connect(self.loader.load)
+        self.loader.snapshots_ready.connect(self.apply_snapshots)
+        self.loader_thread.start()
+        
+        # Tìm kiếm: gộp phím gõ nhanh (debounce) rồi tính kết quả ngoài GUI thread
+        self._search_seq = 0
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(120)
+        self.search_timer.timeout.connect(self.run_search)
+        self.search_thread = QThread()
+        self.search_worker = SearchWorker(self.search_index)
+        self.search_worker.moveToThread(self.search_thread)
+        self.search_requested.connect(self.search_worker.run_query)
+        self.search_worker.results_ready.connect(self.apply_search_results)
+        self.search_thread.start()
+        
+        # Copy / xuất file số lượng lớn chạy ngoài GUI thread
+        self._export_seq = 0
+        self.export_thread = QThread()
+        self.export_worker = ExportWorker()
+        self.export_worker.moveToThread(self.export_thread)
+        self.export_requested.connect(self.export_worker.run_export)
+        self.export_worker.finished.connect(self.on_export_finished)
+        self.export_worker.failed.connect(self.on_export_failed)
+        self.export_thread.start()
+        
+        # Tổng của vùng chọn: gộp các lần selectionChanged liên tiếp (kéo chuột, Shift+click)
+        self.selection_timer = QTimer(self)
+        self.selection_timer.setSingleShot(True)
+        self.selection_timer.setInterval(60)
+        self.selection_timer.timeout.connect(self.refresh_selection_metrics)
         
         self.setup_ui()
         self.setStyleSheet(MODERN_CLEAN_STYLESHEET)
@@ -418,12 +1373,6 @@ class VaultManagerApp(QMainWindow):
         self.setup_shortcuts()
         
         # Default dir check via config
-        if getattr(sys, 'frozen', False):
-            config_dir = os.path.dirname(sys.executable)
-        else:
-            config_dir = os.path.dirname(os.path.abspath(__file__))
-        self.config_file = os.path.join(config_dir, "config.json")
-        config_data = self.load_config()
         default_path = config_data.get("default_path", "")
         
         if default_path and os.path.exists(default_path):
@@ -518,19 +1467,45 @@ class VaultManagerApp(QMainWindow):
         self.btn_refresh = QPushButton()
         self.btn_refresh.setIcon(self.icon_refresh)
         self.btn_refresh.setToolTip("Làm mới dữ liệu thủ công")
-        self.btn_refresh.clicked.connect(self.reload_data)
+        self.btn_refresh.clicked.connect(self.force_reload)
         self.btn_refresh.setCursor(Qt.CursorShape.PointingHandCursor)
         self.btn_refresh.setFixedSize(38, 38)
         
+        # Chuyển chế độ xem: chi tiết từng ô <-> tổng theo vật phẩm
+        self.btn_totals = QPushButton("Σ")
+        self.btn_totals.setCheckable(True)
+        self.btn_totals.setToolTip("Xem tổng số lượng theo từng vật phẩm (mọi kho)")
+        self.btn_totals.toggled.connect(self.toggle_totals_view)
+        self.btn_totals.setCursor(Qt.CursorShape.PointingHandCursor)
+        self.btn_totals.setFixedSize(38, 38)
+        
+        # Xuất bảng đang xem (đã lọc, đúng thứ tự sắp xếp) ra file
+        self.btn_export = QPushButton("⤓")
+        self.btn_export.setToolTip("Xuất bảng đang xem ra CSV / JSON / XLSX (Ctrl+E)")
+        self.btn_export.clicked.connect(self.export_view)
+        self.btn_export.setCursor(Qt.CursorShape.PointingHandCursor)
+        self.btn_export.setFixedSize(38, 38)
+        
+        # Lịch sử thay đổi / tồn kho theo thời điểm
+        self.btn_history = QPushButton("🕘")
+        self.btn_history.setToolTip("Lịch sử tồn kho (Ctrl+H)")
+        self.btn_history.clicked.connect(self.show_history)
+        self.btn_history.setCursor(Qt.CursorShape.PointingHandCursor)
+        self.btn_history.setFixedSize(38, 38)
+        self.btn_history.setEnabled(self.engine.journal is not None)
+        
         search_layout.addWidget(self.search_input)
         search_layout.addWidget(self.btn_clear_search)
+        search_layout.addWidget(self.btn_totals)
+        search_layout.addWidget(self.btn_export)
+        search_layout.addWidget(self.btn_history)
         search_layout.addWidget(self.btn_refresh)
         
         # Stacked Widget
         self.stack = QStackedWidget()
         
         # Bảng hiển thị tối ưu
-        self.table = QTableView()
+        self.table = InstrumentedTableView()
         self.table.setModel(self.proxy_model)
         self.table.setSortingEnabled(True)
         
@@ -566,8 +1541,30 @@ class VaultManagerApp(QMainWindow):
         empty_layout.addWidget(lbl_empty_icon)
         empty_layout.addWidget(self.lbl_empty_text)
 
+        # Bảng tổng theo vật phẩm
+        self.totals_table = InstrumentedTableView()
+        self.totals_table.setModel(self.totals_proxy)
+        self.totals_table.setSortingEnabled(True)
+        self.totals_table.sortByColumn(2, Qt.SortOrder.DescendingOrder)
+        totals_header = self.totals_table.horizontalHeader()
+        totals_header.setSectionResizeMode(QHeaderView.ResizeMode.Interactive)
+        totals_header.setStretchLastSection(True)
+        totals_header.setDefaultAlignment(Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter)
+        self.totals_table.verticalHeader().setVisible(False)
+        self.totals_table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.totals_table.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
+        self.totals_table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.totals_table.setShowGrid(False)
+        self.totals_table.setColumnWidth(0, 220)
+        self.totals_table.setColumnWidth(1, 220)
+        self.totals_table.setColumnWidth(2, 120)
+        self.totals_table.setColumnWidth(3, 90)
+        self.totals_table.selectionModel().selectionChanged.connect(self.update_selection_metrics)
+        self.totals_table.doubleClicked.connect(self.copy_single_row)
+
         self.stack.addWidget(self.table)
         self.stack.addWidget(self.empty_state)
+        self.stack.addWidget(self.totals_table)
 
         right_layout.addWidget(self.error_banner)
         right_layout.addLayout(search_layout)
@@ -589,6 +1586,7 @@ class VaultManagerApp(QMainWindow):
         self.lbl_metrics = QLabel(" | Tổng: 0 Items | 0 Vaults ")
         self.lbl_selection = QLabel("")
         self.lbl_last_update = QLabel(" Cập nhật cuối: Chưa từng ")
+        self.lbl_last_update.setToolTip(f"JSON decoder: {get_json_backend().name}")
         
         # Layout components onto status bar
         self.status_bar.addWidget(QLabel(" 📁 "))
@@ -613,14 +1611,32 @@ class VaultManagerApp(QMainWindow):
         self.search_shortcut.triggered.connect(lambda: self.search_input.setFocus())
         self.addAction(self.search_shortcut)
         
+        self.history_shortcut = QAction("History", self)
+        self.history_shortcut.setShortcut(QKeySequence("Ctrl+H"))
+        self.history_shortcut.triggered.connect(self.show_history)
+        self.addAction(self.history_shortcut)
+        
+        self.export_shortcut = QAction("Export", self)
+        self.export_shortcut.setShortcut(QKeySequence("Ctrl+E"))
+        self.export_shortcut.triggered.connect(self.export_view)
+        self.addAction(self.export_shortcut)
+        
+        self.diagnostics_shortcut = QAction("Diagnostics", self)
+        self.diagnostics_shortcut.setShortcut(QKeySequence("Ctrl+Shift+D"))
+        self.diagnostics_shortcut.triggered.connect(self.show_diagnostics)
+        self.addAction(self.diagnostics_shortcut)
+        
         self.refresh_shortcut = QAction("Refresh", self)
         self.refresh_shortcut.setShortcut(QKeySequence(Qt.Key.Key_F5))
-        self.refresh_shortcut.triggered.connect(self.reload_data)
+        self.refresh_shortcut.triggered.connect(self.force_reload)
         self.addAction(self.refresh_shortcut)
 
     def set_status_live(self, is_live):
         if is_live:
-            self.lbl_status_indicator.setText("● LIVE")
+            self.lbl_status_indicator.setText("● LIVE (POLL)" if self._polling else "● LIVE")
+            self.lbl_status_indicator.setToolTip(
+                "Đang quét thay đổi định kỳ (không nhận được sự kiện từ hệ thống file)"
+                if self._polling else "")
             self.lbl_status_indicator.setObjectName("StatusIndicatorLive")
         else:
             self.lbl_status_indicator.setText("● OFFLINE")
@@ -640,20 +1656,22 @@ class VaultManagerApp(QMainWindow):
             self.save_config(norm_path)
 
     def show_empty_path_state(self):
+        self._cancel_pending_load()
         self.lbl_path.setText("Click để chọn thư mục...")
         self.set_status_live(False)
         self.stack.setCurrentIndex(1)
         self.lbl_empty_text.setText("Chưa chọn thư mục.\nHãy chọn đường dẫn chứa các file .json của vault.")
         self.vault_list.clear()
-        self.source_model.update_data([])
+        self.source_model.clear()
+        self.totals_model.clear()
         self.update_metrics_bar(0)
         self.error_banner.setVisible(False)
 
     def load_config(self):
         try:
             if os.path.exists(self.config_file):
-                with open(self.config_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
+                with open(self.config_file, 'rb') as f:
+                    return get_json_backend().loads(f.read())
         except Exception:
             pass
         return {}
@@ -672,53 +1690,130 @@ class VaultManagerApp(QMainWindow):
             self.show_empty_path_state()
             return
             
-        self.log_path = path
         short_path = path if len(path) < 50 else f"...{path[-47:]}"
         self.lbl_path.setText(f"{short_path}")
         self.lbl_path.setToolTip(path)
         
-        if self.observer:
-            self.observer.stop()
-            self.observer.join()
+        self.stop_watching()
+        
+        if path != self.log_path:
+            self.source_model.clear()
+            self.totals_model.clear()
+        self.log_path = path
+        
+        # Thư mục chính + các thư mục phụ trong config ("watch_paths"), lọc theo glob
+        config_data = self.load_config()
+        self.watch_set = WatchSet([path] + list(config_data.get("watch_paths", [])),
+                                  config_data.get("watch_include", ["*.json"]),
+                                  config_data.get("watch_exclude", []),
+                                  config_data.get("watch_recursive", True))
+        if len(self.watch_set.roots) > 1:
+            self.lbl_path.setToolTip("\n".join(self.watch_set.roots))
         
-        self.handler = LogWatcherHandler()
-        self.handler.file_changed.connect(self.reload_data)
+        # "watch_mode": "native" (chỉ watchdog), "polling" (chỉ quét stat) hoặc
+        # "auto": watchdog + quét kiểm tra thưa, tự chuyển sang polling khi
+        # phát hiện sự kiện native bị mất
+        watch_mode = config_data.get("watch_mode", "auto")
+        self._polling = watch_mode == "polling"
+        self._missed_polls = 0
         
-        self.observer = Observer()
-        self.observer.schedule(self.handler, path, recursive=False)
-        self.observer.start()
+        if not self._polling:
+            self.handler = LogWatcherHandler(self.watch_set)
+            self.handler.file_changed.connect(self.reload_data)
+            
+            # Một Observer, một handler cho mọi thư mục -> một hàng đợi sự kiện chung
+            self.observer = Observer()
+            for root in self.watch_set.roots:
+                if os.path.isdir(root):
+                    self.observer.schedule(self.handler, root, recursive=self.watch_set.recursive)
+            self.observer.start()
+        
+        if watch_mode != "native":
+            self.poller = PollingWatcher(self.watch_set)
+            if not self._polling:
+                self.poller.set_intervals(2.0, 10.0)  # Chỉ để kiểm tra watchdog
+            self.poller.changes_detected.connect(self.on_poll_changes)
+            self.poller.start()
         
         self.set_status_live(True)
         self.reload_data()
 
-    def reload_data(self):
-        if not self.log_path or not os.path.exists(self.log_path):
+    def stop_watching(self):
+        for watcher in (self.observer, self.poller):
+            if watcher:
+                watcher.stop()
+                watcher.join()
+        self.observer = None
+        self.poller = None
+
+    def on_poll_changes(self, paths, since):
+        PROFILER.count("watch.poll_changes", len(paths))
+        if self._polling:
+            self.reload_data(paths)
             return
+        # Chờ một chút để sự kiện native (nếu có) kịp về rồi mới kết luận
+        poller = self.poller
+        QTimer.singleShot(1000, lambda: self._verify_native_events(poller, paths, since))
+
+    def _verify_native_events(self, poller, paths, since):
+        if poller is not self.poller or self._polling:
+            return  # Đã đổi thư mục / đã chuyển sang polling
+        seen = self.handler.last_event
+        missed = [p for p in paths if seen.get(os.path.normcase(p), 0.0) < since]
+        if not missed:
+            self._missed_polls = 0
+            return
+        self.reload_data(missed)
+        self._missed_polls += 1
+        if self._missed_polls >= 2:
+            self.switch_to_polling()
 
-        # Lưu lại trạng thái thanh cuộn để chống flickering
-        scroll_pos = self.table.verticalScrollBar().value()
-        self.table.setUpdatesEnabled(False)
+    def switch_to_polling(self):
+        # Watchdog im lặng trong khi file vẫn đổi: tắt observer, quét stat dày hơn
+        if self.observer:
+            self.observer.stop()
+            self.observer.join()
+            self.observer = None
+        self._polling = True
+        self.poller.set_intervals(0.5, 5.0)
+        self.set_status_live(True)
 
-        current_vaults = [f for f in os.listdir(self.log_path) if f.endswith(".json")]
-        
-        parsed_data = []
+    def force_reload(self):
+        # Làm mới thủ công (F5): bỏ cache, parse lại toàn bộ
+        self.reload_data(full=True)
+
+    def _cancel_pending_load(self):
+        self._load_generation += 1
+        self.loader.latest_generation = self._load_generation
+
+    def reload_data(self, changed_paths=None, full=False):
+        if self.watch_set is None or not os.path.exists(self.log_path):
+            return
+
+        self._cancel_pending_load()
+        PROFILER.count("reload.requested")
+        self.load_requested.emit(self._load_generation, self.watch_set, list(changed_paths or []), full)
+
+    def apply_snapshots(self, generation, snapshots):
+        if generation != self._load_generation:
+            PROFILER.count("reload.discarded")
+            return  # Kết quả của lần tải đã bị thay thế
+        PROFILER.count("reload.applied")
+
+        vault_blocks = []
         vault_counts = {}
         error_vaults = []
+        error_names = set()
+        pending_names = set()
         
-        for file in sorted(current_vaults):
-            vault_name = file.replace(".json", "").capitalize()
-            vault_counts[vault_name] = 0
-            file_path = os.path.join(self.log_path, file)
-            
-            try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    items = json.load(f)
-                    for item in items:
-                        item['vault'] = vault_name
-                        parsed_data.append(item)
-                        vault_counts[vault_name] += 1
-            except Exception as e:
-                error_vaults.append(f"{vault_name} ({str(e)})")
+        for snap in snapshots:
+            vault_counts[snap.vault_name] = len(snap.items)
+            vault_blocks.append((snap.path, self.store.vaults.intern(snap.vault_name), snap.items))
+            if snap.incomplete:
+                pending_names.add(snap.vault_name)
+            elif snap.error:
+                error_vaults.append(f"{snap.vault_name} ({snap.error})")
+                error_names.add(snap.vault_name)
 
         # Xử lý banner lỗi
         if error_vaults:
@@ -740,9 +1835,12 @@ class VaultManagerApp(QMainWindow):
         self.vault_list.addItem(item_all)
         
         for v_name in sorted(vault_counts.keys()):
-            if any(v_name in ev for ev in error_vaults):
+            if v_name in error_names:
                 item = QListWidgetItem(f" {v_name} (Lỗi)")
                 item.setIcon(self.icon_error)
+            elif v_name in pending_names:
+                item = QListWidgetItem(f" {v_name} (Đang ghi...)")
+                item.setIcon(self.vault_icon)
             else:
                 item = QListWidgetItem(f" {v_name} ({vault_counts[v_name]})")
                 item.setIcon(self.vault_icon)
@@ -763,18 +1861,19 @@ class VaultManagerApp(QMainWindow):
             self.vault_list.setCurrentRow(0)
 
         # Nạp dữ liệu
-        self.source_model.update_data(parsed_data)
+        with PROFILER.span("model.update", {"vaults": len(vault_blocks)}):
+            self.proxy_model.refresh_text_matches()
+            self.source_model.update_vaults(vault_blocks)
+        with PROFILER.span("totals.update"):
+            self.totals_proxy.refresh_text_matches()
+            self.totals_model.update_vaults(vault_blocks)
         
         # Dashboard updates
-        self.update_metrics_bar(len(vault_counts))
+        self.update_metrics_bar(len(vault_counts), sum(vault_counts.values()))
         self.lbl_last_update.setText(f" Cập nhật cuối: {datetime.now().strftime('%H:%M:%S')} ")
         
         self.check_empty_state()
 
-        # Áp dụng lại thanh cuộn và render lại giao diện
-        self.table.verticalScrollBar().setValue(scroll_pos)
-        self.table.setUpdatesEnabled(True)
-
     def on_vault_selected(self, item):
         vault_name = item.data(Qt.ItemDataRole.UserRole)
         if vault_name == "TẤT CẢ CÁC KHO":
@@ -784,88 +1883,194 @@ class VaultManagerApp(QMainWindow):
         self.check_empty_state()
 
     def on_search_changed(self, text):
-        self.proxy_model.setFilterText(text)
+        if text:
+            self.search_timer.start()
+            return
+        # Xoá ô tìm kiếm: bỏ bộ lọc ngay, huỷ các truy vấn đang chờ
+        self.search_timer.stop()
+        self._search_seq += 1
+        self.search_worker.latest_seq = self._search_seq
+        self.proxy_model.setFilterText("")
+        self.totals_proxy.setFilterText("")
+        self.check_empty_state()
+
+    def run_search(self):
+        self._search_seq += 1
+        self.search_worker.latest_seq = self._search_seq
+        self.search_requested.emit(self._search_seq, self.search_input.text().lower())
+
+    def apply_search_results(self, seq, query, name_hits, id_hits):
+        if seq != self._search_seq:
+            return  # Truy vấn đã bị thay thế bởi phím gõ mới hơn
+        self.proxy_model.setTextMatches(query, name_hits, id_hits)
+        self.totals_proxy.setTextMatches(query, name_hits, id_hits)
+        self.check_empty_state()
+
+    def show_diagnostics(self):
+        # Không modal: để mở trong khi dùng app và xem số liệu cập nhật
+        if self.diagnostics_dialog is None:
+            self.diagnostics_dialog = DiagnosticsDialog(self)
+            self.diagnostics_dialog.setStyleSheet(MODERN_CLEAN_STYLESHEET)
+        self.diagnostics_dialog.show()
+        self.diagnostics_dialog.raise_()
+
+    def show_history(self):
+        if self.engine.journal is None:
+            return
+        dialog = HistoryDialog(self.engine.journal, self)
+        dialog.setStyleSheet(MODERN_CLEAN_STYLESHEET)
+        dialog.exec()
+
+    def toggle_totals_view(self, checked):
         self.check_empty_state()
 
+    def current_table(self):
+        return self.totals_table if self.btn_totals.isChecked() else self.table
+
     def check_empty_state(self):
-        if self.proxy_model.rowCount() == 0:
+        table = self.current_table()
+        if table.model().rowCount() == 0:
             if self.search_input.text():
                 self.lbl_empty_text.setText(f"Không tìm kết quả nào cho '{self.search_input.text()}'")
             else:
                 self.lbl_empty_text.setText("Kho rỗng. Chưa có vật phẩm nào.")
             self.stack.setCurrentIndex(1)
         else:
-            self.stack.setCurrentIndex(0)
+            self.stack.setCurrentWidget(table)
 
-    def update_metrics_bar(self, num_vaults):
-        total_items = self.source_model.rowCount()
+    def update_metrics_bar(self, num_vaults, total_items=0):
         self.lbl_metrics.setText(f" | Tổng: {total_items} items trong {num_vaults} vaults ")
 
+    def selected_proxy_rows(self, table):
+        # Đọc các khoảng của QItemSelection thay vì selectedRows() (một QModelIndex cho mỗi dòng)
+        proxy_rows = set()
+        for selection_range in table.selectionModel().selection():
+            proxy_rows.update(range(selection_range.top(), selection_range.bottom() + 1))
+        return sorted(proxy_rows)
+
+    def selected_source_rows(self, table):
+        # Dòng source của vùng chọn theo thứ tự đang hiển thị
+        return self.map_to_source_rows(table.model(), self.selected_proxy_rows(table))
+
+    def map_to_source_rows(self, proxy, proxy_rows):
+        map_to_source, index = proxy.mapToSource, proxy.index
+        return [map_to_source(index(r, 0)).row() for r in proxy_rows]
+
     def update_selection_metrics(self, selected, deselected):
-        indexes = self.table.selectionModel().selectedRows()
-        if not indexes:
-            self.lbl_selection.setText("")
-            return
-            
-        total_qty = 0
-        for idx in indexes:
-            qty_idx = self.proxy_model.index(idx.row(), 2)
-            qty = self.proxy_model.data(qty_idx, Qt.ItemDataRole.DisplayRole)
-            try:
-                total_qty += int(qty)
-            except:
-                pass
-                
-        if len(indexes) == 1:
-            self.lbl_selection.setText("")
-        else:
-            self.lbl_selection.setText(f" | Đang chọn {len(indexes)} dòng (Tổng: {total_qty}) ")
+        self.selection_timer.start()
+
+    def refresh_selection_metrics(self):
+        table = self.current_table()
+        proxy = table.model()
+        source = proxy.sourceModel()
+        with PROFILER.span("selection.metrics"):
+            proxy_rows = self.selected_proxy_rows(table)
+            if len(proxy_rows) <= 1:
+                self.lbl_selection.setText("")
+                return
+            if len(proxy_rows) == proxy.rowCount():
+                # Chọn tất cả (Ctrl+A): tổng không phụ thuộc thứ tự, khỏi ánh xạ từng dòng
+                if proxy.rowCount() == source.rowCount():
+                    rows = range(source.rowCount())
+                else:
+                    root = QModelIndex()
+                    rows = [r for r in range(source.rowCount()) if proxy.filterAcceptsRow(r, root)]
+            else:
+                rows = self.map_to_source_rows(proxy, proxy_rows)
+            total_qty = source.quantity_sum(rows)
+        self.lbl_selection.setText(f" | Đang chọn {len(proxy_rows)} dòng (Tổng: {total_qty}) ")
 
     def copy_single_row(self, index):
         if not index.isValid(): return
         row = index.row()
+        proxy = index.model()
         
         info = []
-        for col in range(self.proxy_model.columnCount()):
-            header = self.source_model.headerData(col, Qt.Orientation.Horizontal)
-            data = self.proxy_model.data(self.proxy_model.index(row, col), Qt.ItemDataRole.DisplayRole)
+        for col in range(proxy.columnCount()):
+            header = proxy.headerData(col, Qt.Orientation.Horizontal)
+            data = proxy.data(proxy.index(row, col), Qt.ItemDataRole.DisplayRole)
             info.append(f"{header}: {data}")
             
         copy_text = " | ".join(info)
         QApplication.clipboard().setText(copy_text)
         self.show_copied_status()
 
+    def view_export(self, table, proxy_rows=None):
+        # (tiêu đề, các dòng) của bảng đang xem; proxy_rows=None = toàn bộ dòng đã lọc
+        proxy = table.model()
+        source = proxy.sourceModel()
+        if proxy_rows is None:
+            source_rows = self.map_to_source_rows(proxy, range(proxy.rowCount()))
+        else:
+            source_rows = self.map_to_source_rows(proxy, proxy_rows)
+        headers = [proxy.headerData(i, Qt.Orientation.Horizontal) for i in range(proxy.columnCount())]
+        return headers, source.export_rows(source_rows)
+
     def copy_selection(self):
-        indexes = self.table.selectionModel().selectedRows()
-        if not indexes: return
-            
-        indexes = sorted(indexes, key=lambda x: x.row())
-        headers = [self.source_model.headerData(i, Qt.Orientation.Horizontal) for i in range(self.source_model.columnCount())]
-        copy_text = "\t".join(headers) + "\n"
-        
-        for idx in indexes:
-            row_data = []
-            for col in range(self.proxy_model.columnCount()):
-                col_idx = self.proxy_model.index(idx.row(), col)
-                data = self.proxy_model.data(col_idx, Qt.ItemDataRole.DisplayRole)
-                row_data.append(str(data))
-            copy_text += "\t".join(row_data) + "\n"
-            
-        QApplication.clipboard().setText(copy_text)
-        self.show_copied_status()
-        
+        table = self.current_table()
+        with PROFILER.span("copy_selection"):
+            source_rows = self.selected_source_rows(table)
+            if not source_rows:
+                return
+            proxy = table.model()
+            headers = [proxy.headerData(i, Qt.Orientation.Horizontal) for i in range(proxy.columnCount())]
+            rows = proxy.sourceModel().export_rows(source_rows)
+            if len(rows) < BULK_EXPORT_THREAD_ROWS:
+                QApplication.clipboard().setText(format_tsv(headers, rows))
+                self.show_copied_status()
+                return
+        self.start_export("", headers, rows)
+
+    def export_view(self):
+        filters = "CSV (*.csv);;JSON (*.json);;Excel (*.xlsx)"
+        path, _ = QFileDialog.getSaveFileName(self, "Xuất bảng đang xem", "vault_export.csv", filters)
+        if not path:
+            return
+        with PROFILER.span("export.collect"):
+            headers, rows = self.view_export(self.current_table())
+        self.start_export(path, headers, rows)
+
+    def start_export(self, target, headers, rows):
+        self._export_seq += 1
+        self.lbl_selection.setText(f" | ⏳ Đang xuất {len(rows)} dòng... ")
+        self.export_requested.emit(self._export_seq, target, headers, rows)
+
+    def on_export_finished(self, seq, target, result):
+        if seq != self._export_seq:
+            return
+        if target:
+            self.lbl_selection.setText(f" | ✅ Đã xuất {result} dòng: {os.path.basename(target)} ")
+        else:
+            QApplication.clipboard().setText(result)
+            self.lbl_selection.setText("")
+            self.show_copied_status()
+
+    def on_export_failed(self, seq, target, message):
+        if seq == self._export_seq:
+            self.lbl_selection.setText(f" | ⚠️ Lỗi xuất file: {message} ")
+
     def show_copied_status(self):
         orig_text = self.lbl_selection.text()
         self.lbl_selection.setText(" | ✅ Đã copy vào Clipboard! ")
         QTimer.singleShot(2500, lambda: self.lbl_selection.setText(orig_text))
 
     def closeEvent(self, event):
-        if self.observer:
-            self.observer.stop()
-            self.observer.join()
+        self.stop_watching()
+        self._cancel_pending_load()
+        QMetaObject.invokeMethod(self.loader, "shutdown", Qt.ConnectionType.BlockingQueuedConnection)
+        self.loader_thread.quit()
+        self.loader_thread.wait()
+        self.search_timer.stop()
+        self.search_thread.quit()
+        self.search_thread.wait()
+        self.export_thread.quit()
+        self.export_thread.wait()
+        if self.database_path:
+            self.source_model.database.close()
         event.accept()
 
 if __name__ == "__main__":
+    print(f"JSON decoder: {get_json_backend().name}")
     app = QApplication(sys.argv)
     app.setStyle("Fusion")
     
@@ -0,0 +1,280 @@
+import sys
+import os
+import json
+import time
+import random
+import shutil
+import platform
+import argparse
+import tempfile
+import statistics
+
+# Benchmark các đường nóng của Vault Inventory Manager trên dữ liệu giả lập.
+#   python benchmarks/bench_vaults.py --vaults 250 --slots 54 --items 300 --output bench.json
+#   python benchmarks/bench_vaults.py generate <thư mục> --vaults 500
+# Phần lõi (vault_engine) đo trực tiếp; phần giao diện chạy VaultManagerApp
+# thật với QT_QPA_PLATFORM=offscreen, config/cache nằm trong thư mục tạm.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+ITEM_WORDS = ["diamond", "iron", "gold", "emerald", "netherite", "redstone", "lapis", "quartz",
+              "oak", "spruce", "birch", "stone", "copper", "amethyst", "obsidian", "glass"]
+ITEM_KINDS = ["ingot", "block", "log", "planks", "ore", "shard", "dust", "nugget", "sword", "pickaxe"]
+
+# --- SINH DỮ LIỆU GIẢ LẬP ---
+def item_catalog(distinct_items, seed=0):
+    rng = random.Random(seed)
+    catalog = []
+    for k in range(distinct_items):
+        word, kind = rng.choice(ITEM_WORDS), rng.choice(ITEM_KINDS)
+        item_id = f"minecraft:{word}_{kind}" if k < len(ITEM_WORDS) * len(ITEM_KINDS) else f"mod:{word}_{kind}_{k}"
+        catalog.append((item_id, f"{word.title()} {kind.title()}"))
+    return catalog
+
+def vault_rows(rng, catalog, slots, fill=0.85):
+    # Cùng định dạng mod ghi ra: [{slot, id, count, name}] theo slot tăng dần, ô trống bị bỏ qua
+    rows = []
+    for slot in range(slots):
+        if rng.random() < fill:
+            item_id, name = rng.choice(catalog)
+            rows.append({"slot": slot, "id": item_id, "count": rng.randint(1, 64), "name": name})
+    return rows
+
+def write_vault(path, rows):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(rows, f, indent=2, ensure_ascii=False)  # GSON setPrettyPrinting
+
+def generate_vault_logs(directory, vaults=200, slots=54, distinct_items=300, seed=0):
+    os.makedirs(directory, exist_ok=True)
+    rng = random.Random(seed)
+    catalog = item_catalog(distinct_items, seed)
+    paths = []
+    for vault_id in range(1, vaults + 1):
+        path = os.path.join(directory, f"vaults{vault_id}.json")
+        write_vault(path, vault_rows(rng, catalog, slots))
+        paths.append(path)
+    return paths
+
+# --- ĐO ---
+def summarize(samples_ms):
+    return {
+        "runs": len(samples_ms),
+        "min_ms": round(min(samples_ms), 3),
+        "median_ms": round(statistics.median(samples_ms), 3),
+        "mean_ms": round(statistics.fmean(samples_ms), 3),
+        "max_ms": round(max(samples_ms), 3),
+    }
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return (time.perf_counter() - start) * 1000
+
+def bench_engine(directory, paths, repeat, seed):
+    from vault_engine import VaultEngine, WatchSet
+    results = {}
+    rng = random.Random(seed + 1)
+    catalog = item_catalog(50, seed)
+
+    samples = []
+    for _ in range(repeat):
+        engine = VaultEngine()
+        samples.append(timed(lambda: engine.load([directory])))
+        engine.close()
+    results["engine.cold_load"] = summarize(samples)
+
+    cache_path = os.path.join(tempfile.mkdtemp(prefix="vault-bench-cache-"), "vault_cache.bin")
+    warm = VaultEngine(persist_path=cache_path)
+    warm.load([directory])
+    warm.close()
+    samples = []
+    for _ in range(repeat):
+        engine = VaultEngine(persist_path=cache_path)
+        samples.append(timed(lambda: engine.load([directory])))
+        engine.close()
+    results["engine.cold_load_with_snapshot_cache"] = summarize(samples)
+    shutil.rmtree(os.path.dirname(cache_path), ignore_errors=True)
+
+    engine = VaultEngine()
+    watch = WatchSet([directory])
+    engine.prepare()
+    engine.refresh(watch)
+    samples = []
+    for _ in range(repeat):
+        path = rng.choice(paths)
+        write_vault(path, vault_rows(rng, catalog, 54))
+        samples.append(timed(lambda: engine.refresh(watch, [path], rescan=False)))
+    results["engine.single_file_reload"] = summarize(samples)
+
+    samples = []
+    for _ in range(repeat):
+        engine.index.reset_query_cache()  # Mỗi lượt gõ lại từ đầu
+        for k in range(1, len("diamond") + 1):
+            samples.append(timed(lambda: engine.search("diamond"[:k])))
+    results["engine.search_keystroke"] = summarize(samples)
+
+    samples = [timed(engine.totals) for _ in range(repeat)]
+    results["engine.totals"] = summarize(samples)
+    engine.close()
+    return results
+
+def bench_gui(directory, paths, repeat, seed, copy_rows):
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt6.QtWidgets import QApplication
+    from PyQt6.QtCore import QItemSelection, QItemSelectionModel, Qt
+    import VaultInventoryManager as vim
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    config_dir = tempfile.mkdtemp(prefix="vault-bench-config-")
+    with open(os.path.join(config_dir, "config.json"), 'w', encoding='utf-8') as f:
+        json.dump({"watch_mode": "native"}, f)
+    window = vim.VaultManagerApp(config_dir=config_dir)
+    window.show()
+    results = {}
+    done = {"load": False, "search": False}
+
+    def on_loaded(*_):
+        done["load"] = True
+
+    def on_searched(*_):
+        done["search"] = True
+
+    # Nối sau apply_snapshots / apply_search_results nên chạy sau khi model đã cập nhật
+    window.loader.snapshots_ready.connect(on_loaded)
+    window.search_worker.results_ready.connect(on_searched)
+
+    def wait_for(key, timeout=60.0):
+        done[key] = False
+        deadline = time.perf_counter() + timeout
+        while not done[key]:
+            app.processEvents()
+            if time.perf_counter() > deadline:
+                raise TimeoutError(key)
+            time.sleep(0.0005)
+
+    samples = []
+    for k in range(repeat):
+        def cold():
+            if k == 0:
+                window.start_watching(directory)
+            else:
+                window.force_reload()
+            wait_for("load")
+        samples.append(timed(cold))
+    results["gui.cold_load"] = summarize(samples)
+
+    rng = random.Random(seed + 2)
+    catalog = item_catalog(50, seed)
+    samples = []
+    for _ in range(repeat):
+        path = rng.choice(paths)
+        write_vault(path, vault_rows(rng, catalog, 54))
+
+        def reload_one():
+            window.reload_data([path])
+            wait_for("load")
+        samples.append(timed(reload_one))
+    results["gui.single_file_reload"] = summarize(samples)
+
+    samples = []
+    for _ in range(repeat):
+        for k in range(1, len("diamond") + 1):
+            window.search_input.blockSignals(True)  # Bỏ debounce, gọi truy vấn trực tiếp
+            window.search_input.setText("diamond"[:k])
+            window.search_input.blockSignals(False)
+
+            def keystroke():
+                window.run_search()
+                wait_for("search")
+            samples.append(timed(keystroke))
+        window.search_input.clear()
+        app.processEvents()
+    results["gui.search_keystroke"] = summarize(samples)
+
+    samples = []
+    for _ in range(repeat):
+        for row in range(window.vault_list.count()):
+            item = window.vault_list.item(row)
+            samples.append(timed(lambda: window.on_vault_selected(item)))
+    window.on_vault_selected(window.vault_list.item(0))
+    results["gui.vault_switch"] = summarize(samples)
+
+    samples = []
+    for _ in range(repeat):
+        for column in range(window.source_model.columnCount()):
+            for order in (Qt.SortOrder.AscendingOrder, Qt.SortOrder.DescendingOrder):
+                samples.append(timed(lambda: window.table.sortByColumn(column, order)))
+    results["gui.sort"] = summarize(samples)
+
+    proxy = window.proxy_model
+    rows = min(copy_rows, proxy.rowCount())
+    selection = QItemSelection(proxy.index(0, 0), proxy.index(rows - 1, proxy.columnCount() - 1))
+    samples = []
+    for _ in range(repeat):
+        window.table.clearSelection()
+        window.table.selectionModel().select(selection, QItemSelectionModel.SelectionFlag.Select
+                                             | QItemSelectionModel.SelectionFlag.Rows)
+        samples.append(timed(window.copy_selection))
+    results[f"gui.copy_selection_{rows}_rows"] = summarize(samples)
+
+    window.close()
+    shutil.rmtree(config_dir, ignore_errors=True)
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark Vault Inventory Manager trên dữ liệu giả lập.")
+    parser.add_argument("command", nargs="?", choices=("run", "generate"), default="run")
+    parser.add_argument("directory", nargs="?", default="", help="Thư mục sinh dữ liệu (mặc định: thư mục tạm)")
+    parser.add_argument("--vaults", type=int, default=250)
+    parser.add_argument("--slots", type=int, default=54)
+    parser.add_argument("--items", type=int, default=300, help="Số loại vật phẩm khác nhau")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--copy-rows", type=int, default=10000)
+    parser.add_argument("--no-gui", action="store_true", help="Chỉ đo phần lõi (không cần PyQt6)")
+    parser.add_argument("--output", default="", help="Ghi kết quả JSON ra file thay vì stdout")
+    args = parser.parse_args(argv)
+
+    if args.command == "generate":
+        if not args.directory:
+            parser.error("generate cần thư mục đích")
+        paths = generate_vault_logs(args.directory, args.vaults, args.slots, args.items, args.seed)
+        print(f"Đã tạo {len(paths)} file trong {args.directory}")
+        return 0
+
+    directory = args.directory or tempfile.mkdtemp(prefix="vault-bench-logs-")
+    try:
+        paths = generate_vault_logs(directory, args.vaults, args.slots, args.items, args.seed)
+        results = bench_engine(directory, paths, args.repeat, args.seed)
+        if not args.no_gui:
+            results.update(bench_gui(directory, paths, args.repeat, args.seed, args.copy_rows))
+    finally:
+        if not args.directory:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    import vault_engine
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "json_backend": vault_engine.get_json_backend().name,
+            "vaults": args.vaults,
+            "slots": args.slots,
+            "distinct_items": args.items,
+            "seed": args.seed,
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
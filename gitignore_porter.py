@@ -1,10 +1,20 @@
 import sys
 import os
+import json
+import errno
+import time
+import hashlib
+import struct
+import tarfile
+import zlib
 import shutil
 import ctypes
 import pathspec
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
-                             QPushButton, QTextEdit, QLabel, QProgressBar, QFrame)
+                             QPushButton, QTextEdit, QLabel, QProgressBar, QFrame,
+                             QHBoxLayout, QSpinBox, QCheckBox, QComboBox)
 from PyQt6.QtCore import Qt, QThread, pyqtSignal, QSize
 from PyQt6.QtGui import QFont, QColor, QPalette
 
@@ -20,51 +30,627 @@ def set_immersive_dark_mode(win_id):
         except Exception as e:
             print(f"Lỗi set Dark Mode Title Bar: {e}")
 
+# --- Duyệt cây theo .gitignore ---
+def load_gitignore(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        spec = pathspec.PathSpec.from_lines('gitwildmatch', f)
+    return [pattern for pattern in spec.patterns if pattern.include is not None]
+
+def is_ignored(layers, rel_path):
+    # layers: [(tiền tố thư mục, patterns)] từ gốc xuống; .gitignore sâu hơn được ưu tiên,
+    # trong cùng một file thì pattern viết sau thắng (kể cả "!" để giữ lại)
+    for prefix, patterns in reversed(layers):
+        local_path = rel_path[len(prefix):]
+        for pattern in reversed(patterns):
+            if pattern.match_file(local_path) is not None:
+                return pattern.include
+    return False
+
+def walk_kept_files(root_dir, skip_dirs=()):
+    # Trả về [(đường dẫn đầy đủ, đường dẫn tương đối)] của các file không bị ignore
+    # Thư mục bị ignore bị cắt ngay khi gặp nên không bao giờ được duyệt vào, giống git:
+    # file bên trong một thư mục đã bị ignore không thể được "!" giữ lại
+    skip = {os.path.normcase(os.path.abspath(d)) for d in skip_dirs}
+    kept = []
+    stack = [(root_dir, "", [])]
+    while stack:
+        dir_path, rel_dir, layers = stack.pop()
+        try:
+            with os.scandir(dir_path) as it:
+                entries = sorted(it, key=lambda entry: entry.name)
+        except OSError:
+            continue
+        if any(entry.name == '.gitignore' for entry in entries):
+            try:
+                layers = layers + [(rel_dir, load_gitignore(os.path.join(dir_path, '.gitignore')))]
+            except (OSError, UnicodeDecodeError):
+                pass
+        subdirs = []
+        for entry in entries:
+            rel_path = rel_dir + entry.name
+            if entry.is_dir(follow_symlinks=False):
+                # Bỏ .git và folder Output để tránh loop vô tận
+                if entry.name == '.git' or os.path.normcase(entry.path) in skip:
+                    continue
+                if not is_ignored(layers, rel_path + '/'):
+                    subdirs.append((entry.path, rel_path + '/', layers))
+            elif entry.is_file() and not is_ignored(layers, rel_path):
+                kept.append((entry.path, rel_path if os.sep == '/' else rel_path.replace('/', os.sep)))
+        stack.extend(reversed(subdirs))
+    return kept
+
+# --- Engine copy song song ---
+UI_UPDATES_PER_SEC = 10      # Tối đa số lần cập nhật progress/log mỗi giây
+MAX_LOG_LINES = 5000         # Giữ log_area nhẹ khi xuất hàng chục nghìn file
+
+def default_workers():
+    # Copy là I/O-bound: số luồng vượt số nhân một chút để che độ trễ của đĩa
+    return min(32, (os.cpu_count() or 4) + 4)
+
+def format_eta(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes:02d}:{seconds:02d}"
+
+class ProgressMeter:
+    # Gom tiến độ của các luồng copy, chỉ phát ra UI theo nhịp UI_UPDATES_PER_SEC
+    def __init__(self, total, on_update):
+        self.total = total
+        self.on_update = on_update  # on_update(percent, status, log_lines)
+        self.done = 0
+        self.bytes = 0
+        self.lines = []
+        self.started = time.monotonic()
+        self.last_flush = 0.0
+
+    def add(self, size, line):
+        self.done += 1
+        self.bytes += size
+        self.lines.append(line)
+        now = time.monotonic()
+        if now - self.last_flush >= 1.0 / UI_UPDATES_PER_SEC or self.done == self.total:
+            self.flush(now)
+
+    def flush(self, now=None):
+        now = now or time.monotonic()
+        self.last_flush = now
+        elapsed = max(now - self.started, 1e-6)
+        rate = self.bytes / elapsed
+        remaining = (self.total - self.done) * elapsed / self.done if self.done else 0
+        status = (f"{self.done}/{self.total} file · {rate / 1048576:.1f} MB/s"
+                  f" · ETA {format_eta(remaining)}")
+        percent = int(self.done * 100 / self.total) if self.total else 100
+        self.on_update(percent, status, self.lines)
+        self.lines = []
+
+# --- Chiến lược copy (reflink / kernel / hardlink) ---
+COPY_STRATEGIES = [
+    ("auto", "Tự động"),
+    ("reflink", "Reflink (btrfs/XFS/APFS)"),
+    ("kernel", "Kernel (copy_file_range)"),
+    ("hardlink", "Hardlink (snapshot chỉ đọc)"),
+    ("copy", "Copy thường"),
+]
+FICLONE = 0x40049409
+# Lỗi nghĩa là "filesystem/nền tảng không làm được", khác với lỗi thật của từng file
+UNSUPPORTED_ERRNOS = {errno.EXDEV, errno.EOPNOTSUPP, errno.ENOTSUP, errno.EINVAL, errno.ENOSYS,
+                      errno.ENOTTY, errno.ENOTSOCK, errno.EPERM, errno.EMLINK}
+
+def reflink_file(src, dest):
+    # Clone copy-on-write: không chép dữ liệu, không tốn thêm dung lượng
+    if sys.platform.startswith("linux"):
+        import fcntl
+        with open(src, 'rb') as fsrc, open(dest, 'wb') as fdst:
+            fcntl.ioctl(fdst.fileno(), getattr(fcntl, "FICLONE", FICLONE), fsrc.fileno())
+    elif sys.platform == "darwin":
+        libc = ctypes.CDLL(None, use_errno=True)
+        if libc.clonefile(os.fsencode(src), os.fsencode(dest), 0) != 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), dest)
+    else:
+        raise OSError(errno.ENOTSUP, "Reflink không được hỗ trợ trên nền tảng này", dest)
+    shutil.copystat(src, dest)
+
+def kernel_copy_file(src, dest):
+    # Dữ liệu đi thẳng trong kernel, không qua buffer của Python
+    copy_range = getattr(os, "copy_file_range", None)
+    if copy_range is None and not hasattr(os, "sendfile"):
+        raise OSError(errno.ENOSYS, "Không có copy_file_range/sendfile", dest)
+    with open(src, 'rb') as fsrc, open(dest, 'wb') as fdst:
+        infd, outfd = fsrc.fileno(), fdst.fileno()
+        size = os.fstat(infd).st_size
+        offset = 0
+        while offset < size:
+            if copy_range is not None:
+                sent = copy_range(infd, outfd, size - offset)
+            else:
+                sent = os.sendfile(outfd, infd, offset, size - offset)
+            if sent == 0:
+                break
+            offset += sent
+        if offset < size:
+            # Kernel trả 0 giữa chừng (FS không hỗ trợ, nguồn bị cắt ngắn): để Copier quay về shutil.copy2
+            raise OSError(errno.EINVAL, f"Chỉ chép được {offset}/{size} byte", dest)
+    shutil.copystat(src, dest)
+
+def hardlink_file(src, dest):
+    # Bản xuất dùng chung inode với nguồn: sửa một bên là sửa cả hai
+    os.link(src, dest)
+
+COPY_FUNCS = {
+    "reflink": reflink_file,
+    "kernel": kernel_copy_file,
+    "hardlink": hardlink_file,
+    "copy": shutil.copy2,
+}
+FALLBACK = {"reflink": "kernel", "kernel": "copy", "hardlink": "copy"}
+
+def remove_file(path):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+class Copier:
+    # Copy theo chiến lược đã chọn, tự hạ cấp (reflink → kernel → copy) khi không hỗ trợ
+    def __init__(self, strategy="auto"):
+        self.strategy = strategy
+
+    def detect(self, src, dest_dir):
+        # "auto": thử reflink một file thật vào thư mục đích, vì khả năng clone phụ thuộc
+        # vào cặp filesystem nguồn/đích chứ không chỉ nền tảng
+        if self.strategy != "auto":
+            return self.strategy
+        self.strategy = "kernel" if hasattr(os, "copy_file_range") else "copy"
+        if src is None:
+            return self.strategy  # Không có file nào để thử reflink
+        probe = os.path.join(dest_dir, ".porter-probe")
+        try:
+            reflink_file(src, probe)
+            self.strategy = "reflink"
+        except OSError:
+            pass
+        finally:
+            remove_file(probe)
+        return self.strategy
+
+    def copy(self, src, dest):
+        # Xoá đích cũ trước: nếu nó là hardlink tới nguồn thì ghi đè sẽ làm hỏng file nguồn
+        remove_file(dest)
+        strategy = self.strategy
+        while True:
+            try:
+                COPY_FUNCS[strategy](src, dest)
+                return os.stat(dest)
+            except OSError as e:
+                if strategy == "copy" or e.errno not in UNSUPPORTED_ERRNOS:
+                    raise
+                remove_file(dest)
+                strategy = FALLBACK[strategy]
+                self.strategy = strategy  # Cùng filesystem thì các file sau cũng sẽ lỗi y hệt
+
+# --- Đồng bộ tăng dần (kiểu rsync) ---
+MANIFEST_SUFFIX = ".manifest.json"   # Nằm cạnh <folder>-Output để thư mục xuất sạch
+MANIFEST_VERSION = 1
+HASH_CHUNK = 1 << 20
+
+def file_digest(path):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def load_manifest(path):
+    # {rel: [size, mtime_ns, digest|None]} của lần xuất trước; hỏng/thiếu thì coi như rỗng
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(data, dict) or data.get("version") != MANIFEST_VERSION:
+        return {}
+    return data.get("files", {})
+
+def save_manifest(path, files):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({"version": MANIFEST_VERSION, "files": files}, f, separators=(',', ':'))
+    os.replace(tmp_path, path)
+
+def same_mtime(a_ns, b_ns):
+    # Như rsync: so mtime theo giây để không lệch vì độ phân giải của filesystem
+    return a_ns // 1_000_000_000 == b_ns // 1_000_000_000
+
+def classify(src, dest, rel, manifest, check_hash, hardlink=False):
+    # Trả về (cần copy?, entry manifest) khi so file nguồn với bản đã xuất
+    src_st = os.stat(src)
+    entry = [src_st.st_size, src_st.st_mtime_ns, None]
+    try:
+        dest_st = os.stat(dest)
+    except FileNotFoundError:
+        return True, entry
+    if not hardlink and os.path.samestat(src_st, dest_st):
+        # Còn là hardlink của lần xuất trước: phải copy thật, kẻo sửa bản xuất là sửa luôn nguồn
+        return True, entry
+    if src_st.st_size != dest_st.st_size:
+        return True, entry
+    old = manifest.get(rel)
+    # Hash cũ chỉ còn giá trị nếu file đích chưa bị đụng tới kể từ lần xuất trước
+    old_digest = old[2] if old and old[0] == dest_st.st_size and old[1] == dest_st.st_mtime_ns else None
+    if not check_hash:
+        if same_mtime(src_st.st_mtime_ns, dest_st.st_mtime_ns):
+            return False, [dest_st.st_size, dest_st.st_mtime_ns, old_digest]
+        return True, entry
+    entry[2] = file_digest(src)
+    if entry[2] != (old_digest or file_digest(dest)):
+        return True, entry
+    if src_st.st_mtime_ns != dest_st.st_mtime_ns:
+        shutil.copystat(src, dest)  # Nội dung giống hệt, chỉ đồng bộ lại thời gian
+    return False, entry
+
+def prune_stale(output_dir, keep):
+    # Xoá file trong thư mục xuất không còn trong tập nguồn, rồi dọn thư mục rỗng
+    removed = []
+    for root, dirs, files in os.walk(output_dir, topdown=False):
+        for file in files:
+            full_path = os.path.join(root, file)
+            rel_path = os.path.relpath(full_path, output_dir)
+            if rel_path not in keep:
+                os.remove(full_path)
+                removed.append(rel_path)
+        if root != output_dir and not os.listdir(root):
+            os.rmdir(root)
+    return removed
+
+# --- Xuất thẳng ra file nén (zip / tar.gz / tar.zst) ---
+OUTPUT_FORMATS = [
+    ("folder", "Thư mục"),
+    ("zip", ".zip"),
+    ("tar.gz", ".tar.gz"),
+    ("tar.zst", ".tar.zst"),
+]
+ARCHIVE_CHUNK = 1 << 20        # Mỗi khối nén song song 1 MiB
+DEFLATE_LEVEL = 6
+ZSTD_LEVEL = 3
+DEFAULT_EPOCH = 315532800      # 1980-01-01, mốc nhỏ nhất zip biểu diễn được
+ZIP64_LIMIT = (1 << 31) - 1    # Cùng ngưỡng với zipfile
+GZIP_HEADER = b"\x1f\x8b\x08\x00" + b"\x00" * 4 + b"\x00\xff"  # mtime = 0, OS = unknown
+
+def archive_epoch():
+    # Mọi entry dùng chung một mốc thời gian để archive tái lập được (theo SOURCE_DATE_EPOCH nếu có)
+    try:
+        return max(int(os.environ["SOURCE_DATE_EPOCH"]), DEFAULT_EPOCH)
+    except (KeyError, ValueError):
+        return DEFAULT_EPOCH
+
+def archive_mode(st):
+    return 0o755 if st.st_mode & 0o111 else 0o644
+
+def deflate_chunk(data, last):
+    # Như pigz: mỗi khối nén độc lập, kết thúc bằng sync flush (khối cuối thì Z_FINISH),
+    # nối các khối lại vẫn là một luồng deflate hợp lệ
+    compressor = zlib.compressobj(DEFLATE_LEVEL, zlib.DEFLATED, -15)
+    return compressor.compress(data) + compressor.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+
+def zstd_chunk_func():
+    # Mỗi khối là một frame zstd riêng; các frame nối tiếp nhau vẫn giải nén thành một luồng
+    try:
+        from compression import zstd  # Python 3.14+
+        return lambda data, last: zstd.compress(data, ZSTD_LEVEL)
+    except ImportError:
+        pass
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    return lambda data, last: zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+
+class OrderedWriter:
+    # Hàng đợi ghi giữ đúng thứ tự nộp, xen kẽ khối đang nén (Future) và thao tác ghi (callable)
+    # Chỉ tối đa `window` khối được nén cùng lúc nên bộ nhớ bị chặn dù file lớn cỡ nào
+    def __init__(self, out, pool, window):
+        self.out = out
+        self.pool = pool
+        self.window = window
+        self.queue = deque()
+        self.in_flight = 0
+
+    def submit(self, fn, *args):
+        self.queue.append(self.pool.submit(fn, *args))
+        self.in_flight += 1
+        self.drain(self.window)
+
+    def then(self, callback):
+        self.queue.append(callback)
+        self.drain(self.window)
+
+    def drain(self, limit):
+        while self.queue and (self.in_flight > limit or not isinstance(self.queue[0], Future)):
+            item = self.queue.popleft()
+            if isinstance(item, Future):
+                self.in_flight -= 1
+                self.out.write(item.result())
+            else:
+                item()
+
+    def finish(self):
+        self.drain(0)
+
+class CompressedStream:
+    # Sink kiểu file cho tarfile: cắt luồng tar thành khối ARCHIVE_CHUNK và nén song song
+    def __init__(self, writer, compress, gzip=False):
+        self.writer = writer
+        self.compress = compress
+        self.gzip = gzip
+        self.buffer = bytearray()
+        self.crc = 0
+        self.size = 0
+        if gzip:
+            writer.out.write(GZIP_HEADER)
+
+    def write(self, data):
+        self.buffer += data
+        self.size += len(data)
+        if self.gzip:
+            self.crc = zlib.crc32(data, self.crc)
+        while len(self.buffer) >= ARCHIVE_CHUNK:
+            self.writer.submit(self.compress, bytes(self.buffer[:ARCHIVE_CHUNK]), False)
+            del self.buffer[:ARCHIVE_CHUNK]
+        return len(data)
+
+    def close(self):
+        self.writer.submit(self.compress, bytes(self.buffer), True)
+        self.buffer = bytearray()
+        self.writer.finish()
+        if self.gzip:
+            self.writer.out.write(struct.pack("<II", self.crc, self.size & 0xFFFFFFFF))
+
+class ZipStreamWriter:
+    # Ghi zip tuần tự; dữ liệu từng file được deflate song song theo khối qua OrderedWriter
+    # zipfile không nhận dữ liệu đã nén sẵn nên header được tự viết: local header ghi tạm
+    # rồi vá lại CRC/kích thước khi entry ghi xong (output phải seek được)
+    def __init__(self, writer, epoch):
+        self.writer = writer
+        self.out = writer.out
+        self.entries = []
+        t = time.gmtime(epoch)
+        self.dos_time = t.tm_hour << 11 | t.tm_min << 5 | t.tm_sec // 2
+        self.dos_date = (t.tm_year - 1980) << 9 | t.tm_mon << 5 | t.tm_mday
+
+    def local_header(self, entry):
+        name = entry["name"]
+        if entry["zip64"]:
+            extra = struct.pack("<HHQQ", 1, 16, entry["size"], entry["csize"])
+            csize = size = 0xFFFFFFFF
+        else:
+            extra, csize, size = b"", entry["csize"], entry["size"]
+        return struct.pack("<IHHHHHIIIHH", 0x04034B50, 45 if entry["zip64"] else 20, 0x800, 8,
+                           self.dos_time, self.dos_date, entry["crc"], csize, size,
+                           len(name), len(extra)) + name + extra
+
+    def begin(self, entry):
+        entry["offset"] = self.out.tell()
+        self.out.write(self.local_header(entry))
+        entry["data_start"] = self.out.tell()
+
+    def end(self, entry):
+        end = self.out.tell()
+        entry["csize"] = end - entry["data_start"]
+        if not entry["zip64"] and max(entry["size"], entry["csize"]) > ZIP64_LIMIT:
+            raise RuntimeError(f"{entry['name'].decode('utf-8')} lớn lên khi đang nén, cần zip64")
+        self.out.seek(entry["offset"])
+        self.out.write(self.local_header(entry))
+        self.out.seek(end)
+
+    def add(self, f, arcname, st):
+        entry = {"name": arcname.encode("utf-8"), "mode": archive_mode(st), "crc": 0,
+                 "size": 0, "csize": 0, "zip64": st.st_size * 1.05 > ZIP64_LIMIT}
+        self.entries.append(entry)
+        self.writer.then(lambda: self.begin(entry))
+        remaining = st.st_size
+        while True:
+            data = f.read(min(ARCHIVE_CHUNK, remaining))
+            remaining -= len(data)
+            entry["crc"] = zlib.crc32(data, entry["crc"])
+            entry["size"] += len(data)
+            last = remaining <= 0 or not data
+            self.writer.submit(deflate_chunk, data, last)
+            if last:
+                break
+        self.writer.then(lambda: self.end(entry))
+
+    def close(self):
+        self.writer.finish()
+        cd_offset = self.out.tell()
+        for entry in self.entries:
+            fields, extra_values = [entry["csize"], entry["size"], entry["offset"]], []
+            # Thứ tự trong extra zip64: kích thước gốc, kích thước nén, offset
+            for key, index in (("size", 1), ("csize", 0), ("offset", 2)):
+                if entry[key] > ZIP64_LIMIT:
+                    extra_values.append(entry[key])
+                    fields[index] = 0xFFFFFFFF
+            extra = struct.pack(f"<HH{len(extra_values)}Q", 1, 8 * len(extra_values), *extra_values) if extra_values else b""
+            version = 45 if extra_values or entry["zip64"] else 20
+            name = entry["name"]
+            self.out.write(struct.pack("<IHHHHHHIIIHHHHHII", 0x02014B50, 3 << 8 | version, version,
+                                       0x800, 8, self.dos_time, self.dos_date, entry["crc"],
+                                       fields[0], fields[1], len(name), len(extra), 0, 0, 0,
+                                       (0o100000 | entry["mode"]) << 16, fields[2]) + name + extra)
+        cd_end = self.out.tell()
+        count, cd_size = len(self.entries), cd_end - cd_offset
+        if count > 0xFFFF or cd_size > ZIP64_LIMIT or cd_offset > ZIP64_LIMIT:
+            self.out.write(struct.pack("<IQHHIIQQQQ", 0x06064B50, 44, 3 << 8 | 45, 45, 0, 0,
+                                       count, count, cd_size, cd_offset))
+            self.out.write(struct.pack("<IIQI", 0x07064B50, 0, cd_end, 1))
+            count, cd_size, cd_offset = min(count, 0xFFFF), min(cd_size, 0xFFFFFFFF), min(cd_offset, 0xFFFFFFFF)
+        self.out.write(struct.pack("<IHHHHIIH", 0x06054B50, 0, 0, count, count, cd_size, cd_offset, 0))
+
 # --- Worker Thread để không bị đơ giao diện khi copy file nặng ---
 class CopyWorker(QThread):
     progress = pyqtSignal(int)
     log = pyqtSignal(str)
+    status = pyqtSignal(str)
     finished = pyqtSignal(str)
 
+    def __init__(self, workers=None, incremental=True, check_hash=False, prune=False,
+                 strategy="auto", output_format="folder", parent=None):
+        super().__init__(parent)
+        self.workers = workers or default_workers()
+        self.strategy = strategy
+        self.output_format = output_format
+        self.incremental = incremental
+        self.check_hash = check_hash
+        self.prune = prune
+
+    def plan(self, pool, files_to_copy, output_dir, manifest):
+        # So sánh song song (stat/hash là I/O); lỗi đọc thì cứ copy lại
+        def check(item):
+            src, rel = item
+            try:
+                return classify(src, os.path.join(output_dir, rel), rel, manifest, self.check_hash,
+                                hardlink=self.strategy == "hardlink")
+            except OSError:
+                return True, [None, None, None]
+
+        pending, entries = [], {}
+        for (src, rel), (changed, entry) in zip(files_to_copy, pool.map(check, files_to_copy)):
+            entries[rel] = entry
+            if changed:
+                pending.append((src, rel))
+        return pending, entries
+
+    def emit_batch(self, percent, status, lines):
+        if lines:
+            self.log.emit("\n".join(lines))  # Một lần append cho cả lô
+        self.progress.emit(percent)
+        self.status.emit(status)
+
+    def write_archive(self, files, archive_path):
+        # Thứ tự entry theo thứ tự duyệt (đã sắp theo tên), thời gian/quyền/chủ sở hữu chuẩn hoá:
+        # cùng một cây nguồn luôn cho ra cùng một archive từng byte
+        epoch = archive_epoch()
+        if self.output_format == "tar.zst":
+            compress = zstd_chunk_func()
+            if compress is None:
+                self.log.emit("❌ Cần Python 3.14+ hoặc gói 'zstandard' để xuất .tar.zst")
+                return False
+        self.log.emit(f"📦 Nén {len(files)} file vào {os.path.basename(archive_path)}, {self.workers} luồng nén")
+        meter = ProgressMeter(len(files), self.emit_batch)
+        errors = 0
+        tmp_path = archive_path + ".tmp"
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="porter-pack") as pool, \
+                    open(tmp_path, 'wb') as out:
+                writer = OrderedWriter(out, pool, window=self.workers * 2)
+                if self.output_format == "zip":
+                    archive = ZipStreamWriter(writer, epoch)
+                else:
+                    stream = CompressedStream(writer, deflate_chunk if self.output_format == "tar.gz" else compress,
+                                              gzip=self.output_format == "tar.gz")
+                    archive = tarfile.open(fileobj=stream, mode='w|', format=tarfile.PAX_FORMAT)
+                for src, rel in files:
+                    arcname = rel.replace(os.sep, '/')
+                    try:
+                        f = open(src, 'rb')
+                    except OSError as e:
+                        errors += 1
+                        meter.add(0, f"⚠️ Lỗi đọc {rel}: {e}")
+                        continue
+                    with f:
+                        st = os.fstat(f.fileno())
+                        if self.output_format == "zip":
+                            archive.add(f, arcname, st)
+                        else:
+                            info = tarfile.TarInfo(arcname)
+                            info.size, info.mtime, info.mode = st.st_size, epoch, archive_mode(st)
+                            info.uid = info.gid = 0
+                            info.uname = info.gname = ""
+                            archive.addfile(info, f)
+                    meter.add(st.st_size, f"📦 Packed: {rel}")
+                archive.close()
+                if self.output_format != "zip":
+                    stream.close()
+            os.replace(tmp_path, archive_path)
+        except BaseException:
+            remove_file(tmp_path)
+            raise
+        if not files:
+            meter.flush()
+        if errors:
+            self.log.emit(f"⚠️ {errors} file không đọc được")
+        return True
+
     def run(self):
         try:
             root_dir = os.getcwd()
             folder_name = os.path.basename(root_dir)
             output_dir = os.path.join(os.path.dirname(root_dir), f"{folder_name}-Output")
-            
-            if not os.path.exists(output_dir):
-                os.makedirs(output_dir)
 
             gitignore_path = os.path.join(root_dir, '.gitignore')
             if not os.path.exists(gitignore_path):
                 self.log.emit("❌ Không tìm thấy file .gitignore!")
                 return
 
-            with open(gitignore_path, 'r', encoding='utf-8') as f:
-                spec = pathspec.PathSpec.from_lines('gitwildmatch', f)
+            files_to_copy = walk_kept_files(root_dir, skip_dirs=[output_dir])
 
-            files_to_copy = []
-            for root, dirs, files in os.walk(root_dir):
-                # Loại bỏ folder Output và .git để tránh loop vô tận
-                if output_dir in root or '.git' in root:
-                    continue
-                
-                for file in files:
-                    full_path = os.path.join(root, file)
-                    rel_path = os.path.relpath(full_path, root_dir)
-                    
-                    if not spec.match_file(rel_path):
-                        files_to_copy.append((full_path, rel_path))
-
-            total = len(files_to_copy)
-            for i, (src, rel) in enumerate(files_to_copy):
-                dest = os.path.join(output_dir, rel)
-                os.makedirs(os.path.dirname(dest), exist_ok=True)
-                shutil.copy2(src, dest)
-                
-                prog = int(((i + 1) / total) * 100)
-                self.progress.emit(prog)
-                self.log.emit(f"🚚 Copied: {rel}")
+            if self.output_format != "folder":
+                archive_path = f"{output_dir}.{self.output_format}"
+                if self.write_archive(files_to_copy, archive_path):
+                    self.finished.emit(archive_path)
+                return
+
+            if not os.path.exists(output_dir):
+                os.makedirs(output_dir)
+
+            manifest_path = output_dir + MANIFEST_SUFFIX
+            errors = 0
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="porter-copy") as pool:
+                if self.incremental:
+                    self.log.emit("🔎 Đang so sánh với lần xuất trước...")
+                    pending, entries = self.plan(pool, files_to_copy, output_dir, load_manifest(manifest_path))
+                    self.log.emit(f"⏭️ Bỏ qua {len(files_to_copy) - len(pending)} file không đổi")
+                else:
+                    pending, entries = files_to_copy, {}
+
+                # Tạo sẵn cây thư mục một lần, các luồng copy không phải gọi makedirs
+                for rel_dir in sorted({os.path.dirname(rel) for _, rel in pending}):
+                    os.makedirs(os.path.join(output_dir, rel_dir), exist_ok=True)
+
+                total = len(pending)
+                copier = Copier(self.strategy)
+                # Không có gì cần copy vẫn dò chiến lược thật để log đúng (không in "auto")
+                copier.detect((pending or files_to_copy or [(None, None)])[0][0], output_dir)
+                self.log.emit(f"⚙️ {total} file cần copy, {self.workers} luồng copy ({copier.strategy})")
+                chosen = copier.strategy
+                meter = ProgressMeter(total, self.emit_batch)
+                futures = {pool.submit(copier.copy, src, os.path.join(output_dir, rel)): rel
+                           for src, rel in pending}
+                for future in as_completed(futures):
+                    rel = futures[future]
+                    try:
+                        st = future.result()
+                    except OSError as e:
+                        errors += 1
+                        entries.pop(rel, None)  # Lần sau sẽ thử lại
+                        meter.add(0, f"⚠️ Lỗi copy {rel}: {e}")
+                        continue
+                    digest = entries.get(rel, [None] * 3)[2]
+                    entries[rel] = [st.st_size, st.st_mtime_ns, digest]
+                    meter.add(st.st_size, f"🚚 Copied: {rel}")
+            if total == 0:
+                meter.flush()
+            if copier.strategy != chosen:
+                self.log.emit(f"↩️ {chosen} không được hỗ trợ, đã chuyển sang {copier.strategy}")
+            if errors:
+                self.log.emit(f"⚠️ {errors} file không copy được")
+
+            if self.prune:
+                removed = prune_stale(output_dir, {rel for _, rel in files_to_copy})
+                for rel in removed[:MAX_LOG_LINES]:
+                    self.log.emit(f"🗑️ Removed: {rel}")
+                self.log.emit(f"🗑️ Đã xoá {len(removed)} file không còn trong nguồn")
+            save_manifest(manifest_path, entries)
 
             self.finished.emit(output_dir)
         except Exception as e:
@@ -79,7 +665,7 @@ class SleekPorter(QMainWindow):
 
     def init_ui(self):
         self.setWindowTitle("GitIgnore Porter v1.0")
-        self.setFixedSize(600, 450)
+        self.setFixedSize(600, 540)
         self.setStyleSheet("""
             QMainWindow { background-color: #121212; }
             QWidget { color: #E0E0E0; font-family: 'Segoe UI', sans-serif; }
@@ -136,10 +722,46 @@ class SleekPorter(QMainWindow):
 
         self.log_area = QTextEdit()
         self.log_area.setReadOnly(True)
+        self.log_area.document().setMaximumBlockCount(MAX_LOG_LINES)
         
         self.pbar = QProgressBar()
         self.pbar.setValue(0)
 
+        self.label_status = QLabel("")
+        self.label_status.setStyleSheet("color: #888888;")
+
+        self.spin_workers = QSpinBox()
+        self.spin_workers.setRange(1, 64)
+        self.spin_workers.setValue(default_workers())
+        options_layout = QHBoxLayout()
+        options_layout.addWidget(QLabel("Luồng copy:"))
+        options_layout.addWidget(self.spin_workers)
+        options_layout.addStretch()
+
+        # Đồng bộ tăng dần: chỉ copy file mới/đổi so với lần xuất trước
+        self.chk_incremental = QCheckBox("Chỉ copy file thay đổi")
+        self.chk_incremental.setChecked(True)
+        self.chk_hash = QCheckBox("So nội dung (hash)")
+        self.chk_prune = QCheckBox("Xoá file thừa")
+        self.chk_incremental.toggled.connect(self.update_option_states)
+        options_layout.addWidget(self.chk_incremental)
+        options_layout.addWidget(self.chk_hash)
+        options_layout.addWidget(self.chk_prune)
+
+        self.combo_strategy = QComboBox()
+        for key, label in COPY_STRATEGIES:
+            self.combo_strategy.addItem(label, key)
+        self.combo_format = QComboBox()
+        for key, label in OUTPUT_FORMATS:
+            self.combo_format.addItem(label, key)
+        self.combo_format.currentIndexChanged.connect(self.update_option_states)
+        strategy_layout = QHBoxLayout()
+        strategy_layout.addWidget(QLabel("Đầu ra:"))
+        strategy_layout.addWidget(self.combo_format)
+        strategy_layout.addWidget(QLabel("Chiến lược copy:"))
+        strategy_layout.addWidget(self.combo_strategy)
+        strategy_layout.addStretch()
+
         self.btn_start = QPushButton("🚀 Bắt đầu trích xuất (Clean Copy)")
         self.btn_start.clicked.connect(self.start_process)
 
@@ -147,18 +769,34 @@ class SleekPorter(QMainWindow):
         card_layout.addWidget(self.label_desc)
         card_layout.addWidget(self.log_area)
         card_layout.addWidget(self.pbar)
+        card_layout.addWidget(self.label_status)
+        card_layout.addLayout(options_layout)
+        card_layout.addLayout(strategy_layout)
         card_layout.addWidget(self.btn_start)
 
         layout.addWidget(self.card)
 
+    def update_option_states(self):
+        # Đồng bộ tăng dần / chiến lược copy chỉ có nghĩa khi xuất ra thư mục
+        to_folder = self.combo_format.currentData() == "folder"
+        for widget in (self.chk_incremental, self.chk_prune, self.combo_strategy):
+            widget.setEnabled(to_folder)
+        self.chk_hash.setEnabled(to_folder and self.chk_incremental.isChecked())
+
     def start_process(self):
         self.btn_start.setEnabled(False)
         self.log_area.clear()
         self.log_area.append("🔍 Đang phân tích file .gitignore...")
         
-        self.worker = CopyWorker()
+        self.worker = CopyWorker(workers=self.spin_workers.value(),
+                                 incremental=self.chk_incremental.isChecked(),
+                                 check_hash=self.chk_hash.isChecked(),
+                                 prune=self.chk_prune.isChecked(),
+                                 strategy=self.combo_strategy.currentData(),
+                                 output_format=self.combo_format.currentData())
         self.worker.log.connect(lambda msg: self.log_area.append(msg))
         self.worker.progress.connect(lambda val: self.pbar.setValue(val))
+        self.worker.status.connect(self.label_status.setText)
         self.worker.finished.connect(self.on_finished)
         self.worker.start()
 
@@ -166,7 +804,7 @@ class SleekPorter(QMainWindow):
         self.log_area.append(f"\n✅ HOÀN TẤT!")
         self.log_area.append(f"📂 Đã lưu tại: {out_path}")
         self.btn_start.setEnabled(True)
-        os.startfile(out_path) # Tự động mở folder khi xong
+        os.startfile(out_path if os.path.isdir(out_path) else os.path.dirname(out_path)) # Tự động mở folder khi xong
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
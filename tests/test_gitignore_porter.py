@@ -0,0 +1,54 @@
+import os
+
+import pytest
+
+pytest.importorskip("pathspec")
+pytest.importorskip("PyQt6.QtCore")
+
+from gitignore_porter import CopyWorker
+
+
+def export(project, strategy):
+    worker = CopyWorker(workers=2, strategy=strategy)
+    logs = []
+    worker.log.connect(logs.append)
+    cwd = os.getcwd()
+    os.chdir(project)
+    try:
+        worker.run()
+    finally:
+        os.chdir(cwd)
+    return logs
+
+
+def test_hardlink_export_is_replaced_by_real_copy(tmp_path):
+    project = tmp_path / "proj"
+    project.mkdir()
+    (project / ".gitignore").write_text("*.log\n")
+    (project / "a.txt").write_text("nguồn a")
+    (project / "b.txt").write_text("nguồn b")
+    output = tmp_path / "proj-Output"
+
+    export(project, "hardlink")
+    assert os.path.samefile(project / "a.txt", output / "a.txt")
+
+    logs = export(project, "copy")
+    for name in ("a.txt", "b.txt"):
+        assert not os.path.samefile(project / name, output / name)
+    assert any("0 file không đổi" in line for line in logs)
+
+    # Sửa bản xuất không được đụng tới nguồn
+    (output / "a.txt").write_text("đã sửa")
+    assert (project / "a.txt").read_text() == "nguồn a"
+
+
+def test_noop_export_logs_resolved_strategy(tmp_path):
+    project = tmp_path / "proj"
+    project.mkdir()
+    (project / ".gitignore").write_text("")
+    (project / "a.txt").write_text("a")
+
+    export(project, "auto")
+    logs = export(project, "auto")
+    [line] = [line for line in logs if "file cần copy" in line]
+    assert line.startswith("⚙️ 0 file") and "(auto)" not in line
@@ -0,0 +1,108 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from vault_engine import (
+    IncompleteVaultFile, ItemStore, MsgspecBackend, OrjsonBackend, StdlibJsonBackend,
+    SearchIndex, VaultFileCache, WatchSet, optional_import
+)
+
+SAMPLE_ROWS = [
+    {"slot": 0, "id": "minecraft:diamond", "name": "Kim cương", "count": 64},
+    {"slot": 7, "id": "minecraft:oak_log", "name": "Oak Log \"cũ\"", "count": 12},
+    {"slot": 26, "id": "minecraft:stone", "name": "Stone", "count": 1},
+]
+
+SAMPLES = {
+    "compact": json.dumps(SAMPLE_ROWS, ensure_ascii=False, separators=(",", ":")).encode("utf-8"),
+    "indented": (json.dumps(SAMPLE_ROWS, ensure_ascii=False, indent=2) + "\n").encode("utf-8"),
+}
+
+BACKENDS = [
+    StdlibJsonBackend,
+    pytest.param(OrjsonBackend, marks=pytest.mark.skipif(
+        optional_import("orjson") is None, reason="chưa cài orjson")),
+    pytest.param(MsgspecBackend, marks=pytest.mark.skipif(
+        optional_import("msgspec") is None, reason="chưa cài msgspec")),
+]
+
+
+@pytest.mark.parametrize("backend_cls", BACKENDS)
+@pytest.mark.parametrize("layout", sorted(SAMPLES))
+def test_truncated_file_is_incomplete(backend_cls, layout):
+    # Cắt file ở mọi vị trí (như lúc game đang ghi dở): không được báo lỗi thật
+    backend = backend_cls()
+    data = SAMPLES[layout]
+    for cut in range(len(data.rstrip())):
+        with pytest.raises(IncompleteVaultFile):
+            backend.decode_columns(data[:cut])
+
+
+@pytest.mark.parametrize("backend_cls", BACKENDS)
+@pytest.mark.parametrize("layout", sorted(SAMPLES))
+def test_complete_file_decodes(backend_cls, layout):
+    slots, counts, ids, names = backend_cls().decode_columns(SAMPLES[layout])
+    assert list(slots) == [0, 7, 26]
+    assert list(counts) == [64, 12, 1]
+    assert list(ids) == [row["id"] for row in SAMPLE_ROWS]
+    assert list(names) == [row["name"] for row in SAMPLE_ROWS]
+
+
+@pytest.mark.parametrize("backend_cls", BACKENDS)
+@pytest.mark.parametrize("data", [
+    b'[{"slot": 0, "count": 1} x]',
+    b'[{"slot": 0, "name": "\xff\xfe", "count": 1}]',
+])
+def test_corrupt_file_is_not_incomplete(backend_cls, data):
+    with pytest.raises(ValueError) as info:
+        backend_cls().decode_columns(data)
+    assert not isinstance(info.value, IncompleteVaultFile)
+
+
+def test_live_event_keeps_original_case(tmp_path, monkeypatch):
+    # Giả lập Windows: normcase hạ chữ thường, nhưng filesystem vẫn giữ hoa/thường
+    monkeypatch.setattr(os.path, "normcase", str.lower)
+    folder = tmp_path / "InstA"
+    folder.mkdir()
+    vault = folder / "vaults1.json"
+    vault.write_bytes(SAMPLES["compact"])
+    watch = WatchSet([str(tmp_path)])
+    cache = VaultFileCache(ItemStore())
+    [before] = cache.refresh(watch)
+
+    vault.write_bytes(SAMPLES["indented"])
+    new_vault = folder / "vaults2.json"
+    new_vault.write_bytes(SAMPLES["compact"])
+    # PollingWatcher cũ báo đường dẫn đã normcase; watchdog báo đường dẫn gốc
+    after = cache.refresh(watch, [os.path.normcase(str(vault)), str(new_vault)], rescan=False)
+    assert [snap.path for snap in after] == [str(vault), str(new_vault)]
+    assert [snap.vault_name for snap in after] == [before.vault_name, before.vault_name[:-1] + "2"]
+    assert before.vault_name.startswith("InstA/")
+
+
+def test_query_to_closed_pipe_exits_quietly(tmp_path):
+    # "python vault_engine.py query ... | head": bên đọc đóng pipe sớm
+    rows = [{"slot": k, "id": f"minecraft:item_{k}", "name": f"Item {k}", "count": k}
+            for k in range(20000)]
+    (tmp_path / "vaults1.json").write_text(json.dumps(rows))
+    script = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "vault_engine.py")
+    proc = subprocess.Popen([sys.executable, script, "query", "--dir", str(tmp_path)],
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    proc.stdout.readline()
+    proc.stdout.close()
+    stderr = proc.stderr.read()
+    proc.wait()
+    assert b"Traceback" not in stderr
+
+
+def test_search_reset_query_cache_matches_fresh_index(tmp_path):
+    (tmp_path / "vaults1.json").write_bytes(SAMPLES["compact"])
+    store = ItemStore()
+    VaultFileCache(store).refresh(WatchSet([str(tmp_path)]))
+    index = SearchIndex(store)
+    index.match("o")
+    index.reset_query_cache()
+    assert index.match("st") == SearchIndex(store).match("st")
@@ -0,0 +1,1578 @@
+import sys
+import os
+import fnmatch
+import hashlib
+import importlib
+import marshal
+import time
+import zlib
+import threading
+from array import array
+
+# Lõi xử lý dữ liệu vault không phụ thuộc Qt/watchdog: kho dạng cột, chỉ mục
+# tìm kiếm, tổng theo vật phẩm, đọc/cache file vault, CSDL, nhật ký thay đổi.
+# Giao diện (VaultInventoryManager.py), chế độ dòng lệnh và benchmark dùng
+# chung phần này qua VaultEngine. Các module nặng (json, sqlite3,
+# concurrent.futures, msgspec/orjson/ijson) chỉ được import khi thật sự cần.
+
+__all__ = [
+    "VaultEngine", "ItemStore", "VaultItems", "StringTable", "SearchIndex", "ItemAggregator",
+    "VaultSnapshot", "WatchSet", "VaultFileCache", "InventoryDatabase", "ChangeJournal",
+    "IncompleteVaultFile", "parse_vault_file", "get_json_backend", "query_inventory", "main",
+    "Profiler", "PROFILER", "format_tsv", "write_rows", "export_file",
+]
+
+# Các thư viện tuỳ chọn: có thì dùng, không có thì rơi về stdlib
+_optional_modules = {}
+
+def optional_import(name):
+    # Import ở lần dùng đầu tiên; None nếu chưa cài
+    if name not in _optional_modules:
+        try:
+            _optional_modules[name] = importlib.import_module(name)
+        except ImportError:
+            _optional_modules[name] = None
+    return _optional_modules[name]
+
+# --- ĐO HIỆU NĂNG (PROFILER) ---
+# Span (khoảng thời gian có tên) và counter cho các đường nóng: reload, parse
+# từng file, cập nhật model, lọc, sắp xếp... Khi tắt, span() trả về một
+# context manager rỗng dùng chung và count() thoát ngay, nên gần như không tốn
+# gì. Khi bật, sự kiện được giữ trong bộ đệm vòng và xuất được ra định dạng
+# Chrome trace (chrome://tracing, Perfetto).
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+class _Span:
+    __slots__ = ("profiler", "name", "args", "start")
+
+    def __init__(self, profiler, name, args):
+        self.profiler = profiler
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler._record(self.name, self.start, time.perf_counter_ns(), self.args)
+        return False
+
+class Profiler:
+    def __init__(self, max_events=100_000):
+        self.enabled = False
+        self.max_events = max_events
+        self._lock = threading.Lock()  # Span đến từ GUI thread, loader thread và pool parse
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._events = []
+            self._dropped = 0
+            self.stats = {}     # tên span -> [số lần, tổng ns, lớn nhất ns]
+            self.counters = {}  # tên counter -> giá trị
+
+    def span(self, name, args=None):
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, args)
+
+    def count(self, name, n=1):
+        if not self.enabled:
+            return
+        now = time.perf_counter_ns()
+        with self._lock:
+            value = self.counters[name] = self.counters.get(name, 0) + n
+            self._append(("C", name, now, value, 0, None))
+
+    def _append(self, event):
+        if len(self._events) >= self.max_events:
+            # Bộ đệm vòng: bỏ nửa cũ một lần thay vì pop(0) từng sự kiện
+            drop = self.max_events // 2
+            del self._events[:drop]
+            self._dropped += drop
+        self._events.append(event)
+
+    def _record(self, name, start, end, args):
+        duration = end - start
+        tid = threading.get_ident()
+        with self._lock:
+            self._append(("X", name, start, duration, tid, args))
+            entry = self.stats.get(name)
+            if entry is None:
+                self.stats[name] = [1, duration, duration]
+            else:
+                entry[0] += 1
+                entry[1] += duration
+                if duration > entry[2]:
+                    entry[2] = duration
+
+    def summary(self):
+        # [(tên, số lần, tổng ms, trung bình ms, lớn nhất ms)], tốn thời gian nhất trước
+        with self._lock:
+            rows = [(name, n, total / 1e6, total / n / 1e6, peak / 1e6)
+                    for name, (n, total, peak) in self.stats.items()]
+            counters = dict(self.counters)
+        rows.sort(key=lambda r: -r[2])
+        return rows, counters
+
+    def chrome_trace(self):
+        with self._lock:
+            events = list(self._events)
+            dropped = self._dropped
+        pid = os.getpid()
+        trace = []
+        for kind, name, ts, value, tid, args in events:
+            if kind == "X":
+                event = {"name": name, "ph": "X", "ts": ts / 1000, "dur": value / 1000,
+                         "pid": pid, "tid": tid}
+                if args:
+                    event["args"] = args
+            else:
+                event = {"name": name, "ph": "C", "ts": ts / 1000, "pid": pid, "args": {name: value}}
+            trace.append(event)
+        rows, counters = self.summary()
+        return {
+            "traceEvents": trace,
+            "displayTimeUnit": "ms",
+            "otherData": {
+                "dropped_events": dropped,
+                "counters": counters,
+                "spans": {name: {"count": n, "total_ms": round(total, 3), "mean_ms": round(mean, 3),
+                                 "max_ms": round(peak, 3)} for name, n, total, mean, peak in rows},
+            },
+        }
+
+    def export(self, path):
+        import json
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.chrome_trace(), f, ensure_ascii=False)
+
+PROFILER = Profiler()
+
+# --- KHO DỮ LIỆU DẠNG CỘT ---
+# Thay cho list các dict từ json.load: chuỗi (vault, id, tên) được intern vào
+# bảng chuỗi, mỗi dòng chỉ còn vài số nguyên nằm trong các array liền mạch.
+class StringTable:
+    __slots__ = ("strings", "lowered", "_ids", "_lock")
+
+    def __init__(self):
+        self.strings = []
+        self.lowered = []  # Bản lower() tính sẵn cho bộ lọc tìm kiếm
+        self._ids = {}
+        self._lock = threading.Lock()  # Các thread parse intern song song
+
+    def __len__(self):
+        return len(self.strings)
+
+    def lookup(self, text):
+        return self._ids.get(text, -1)
+
+    def intern(self, text):
+        idx = self._ids.get(text)
+        if idx is None:
+            with self._lock:
+                idx = self._ids.get(text)
+                if idx is None:
+                    idx = len(self.strings)
+                    self.strings.append(text)
+                    self.lowered.append(text.lower())
+                    self._ids[text] = idx
+        return idx
+
+    def intern_many(self, texts):
+        ids = self._ids
+        out = array('i', [ids.get(t, -1) for t in texts])
+        for k, idx in enumerate(out):
+            if idx < 0:
+                out[k] = self.intern(texts[k])
+        return out
+
+class VaultItems:
+    # Các cột của một vault, đã sắp theo slot
+    __slots__ = ("slots", "counts", "ids", "names")
+
+    def __init__(self, slots=None, counts=None, ids=None, names=None):
+        self.slots = slots if slots is not None else array('i')
+        self.counts = counts if counts is not None else array('i')
+        self.ids = ids if ids is not None else array('i')
+        self.names = names if names is not None else array('i')
+
+    def __len__(self):
+        return len(self.slots)
+
+class ItemStore:
+    def __init__(self):
+        self.vaults = StringTable()
+        self.ids = StringTable()
+        self.names = StringTable()
+        self.vault = array('i')
+        self.slot = array('i')
+        self.count = array('i')
+        self.item_id = array('i')
+        self.name = array('i')
+        self._slot_labels = {}
+
+    def __len__(self):
+        return len(self.slot)
+
+    def clear(self):
+        self.vault = array('i')
+        self.slot = array('i')
+        self.count = array('i')
+        self.item_id = array('i')
+        self.name = array('i')
+
+    def location(self, row):
+        slot = self.slot[row]
+        label = self._slot_labels.get(slot)
+        if label is None:
+            label = self._slot_labels[slot] = f"Slot {slot}"
+        return label
+
+    def append(self, vault_idx, items):
+        self.insert(len(self.slot), vault_idx, items, 0, len(items))
+
+    def insert(self, row, vault_idx, items, start, end):
+        self.vault[row:row] = array('i', [vault_idx]) * (end - start)
+        self.slot[row:row] = items.slots[start:end]
+        self.count[row:row] = items.counts[start:end]
+        self.item_id[row:row] = items.ids[start:end]
+        self.name[row:row] = items.names[start:end]
+
+    def remove(self, row, n):
+        del self.vault[row:row + n]
+        del self.slot[row:row + n]
+        del self.count[row:row + n]
+        del self.item_id[row:row + n]
+        del self.name[row:row + n]
+
+    def set_row(self, row, items, k):
+        self.count[row] = items.counts[k]
+        self.item_id[row] = items.ids[k]
+        self.name[row] = items.names[k]
+
+# --- CHỈ MỤC TÌM KIẾM (TRIGRAM) ---
+# Tìm trên các chuỗi riêng biệt (tên, id) thay vì trên từng dòng: số tên khác
+# nhau nhỏ hơn số dòng rất nhiều. Mỗi bảng có postings trigram -> id chuỗi,
+# truy vấn được thu hẹp bằng giao các postings rồi mới kiểm tra substring.
+class SearchIndex:
+    def __init__(self, store):
+        self._tables = (store.names, store.ids)
+        self._postings = ({}, {})
+        self._indexed = [0, 0]
+        self._last_query = ""
+        self._last_hits = None
+        self._last_sizes = (0, 0)
+        self._lock = threading.Lock()  # Dùng chung giữa GUI thread và SearchWorker
+
+    def _sync(self):
+        # Bảng chuỗi chỉ tăng thêm, nên chỉ cần index phần mới
+        for t, table in enumerate(self._tables):
+            lowered = table.lowered
+            postings = self._postings[t]
+            end = len(lowered)
+            for sid in range(self._indexed[t], end):
+                text = lowered[sid]
+                for k in range(len(text) - 2):
+                    gram = text[k:k + 3]
+                    bucket = postings.get(gram)
+                    if bucket is None:
+                        postings[gram] = {sid}
+                    else:
+                        bucket.add(sid)
+            self._indexed[t] = end
+
+    def _candidates(self, t, query):
+        if self._last_hits is not None and self._last_query in query:
+            # Gõ thêm ký tự: kết quả mới nằm trong kết quả cũ + các chuỗi mới
+            return self._last_hits[t] | set(range(self._last_sizes[t], self._indexed[t]))
+        if len(query) < 3:
+            return range(self._indexed[t])
+        postings = self._postings[t]
+        buckets = []
+        for k in range(len(query) - 2):
+            bucket = postings.get(query[k:k + 3])
+            if not bucket:
+                return ()
+            buckets.append(bucket)
+        buckets.sort(key=len)
+        return buckets[0].intersection(*buckets[1:])
+
+    def match(self, query):
+        # query đã lower(). Trả về (id tên khớp, id item khớp)
+        with PROFILER.span("search.match"), self._lock:
+            self._sync()
+            hits = []
+            for t in range(2):
+                lowered = self._tables[t].lowered
+                hits.append({sid for sid in self._candidates(t, query) if query in lowered[sid]})
+            self._last_query = query
+            self._last_hits = hits
+            self._last_sizes = tuple(self._indexed)
+            return hits[0], hits[1]
+
+    def reset_query_cache(self):
+        # Quên kết quả truy vấn trước: lần match() sau tìm lại từ postings thay vì
+        # thu hẹp kết quả cũ (vd. benchmark đo lại một lượt gõ từ đầu)
+        with self._lock:
+            self._last_query = ""
+            self._last_hits = None
+
+# --- TỔNG THEO VẬT PHẨM (CỘNG DỒN TĂNG DẦN) ---
+# Mỗi vault đóng góp một bản tóm tắt {id: [số lượng, số ô, tên]}. Khi snapshot
+# của vault đổi chỉ cần trừ đóng góp cũ và cộng đóng góp mới, không tính lại
+# từ đầu trên toàn bộ các dòng.
+class ItemAggregator:
+    def __init__(self):
+        self.totals = {}   # id_idx -> [tổng số lượng, số ô, số vault]
+        self.names = {}    # id_idx -> name_idx (tên gặp gần nhất)
+        self._blocks = {}  # key -> (items, summary) đã được cộng vào
+
+    def clear(self):
+        self.totals.clear()
+        self.names.clear()
+        self._blocks.clear()
+
+    @staticmethod
+    def _summarize(items):
+        summary = {}
+        ids, counts, names = items.ids, items.counts, items.names
+        for k in range(len(items)):
+            entry = summary.get(ids[k])
+            if entry is None:
+                summary[ids[k]] = [counts[k], 1, names[k]]
+            else:
+                entry[0] += counts[k]
+                entry[1] += 1
+        return summary
+
+    def _apply(self, summary, sign, changed):
+        totals = self.totals
+        for id_idx, (count, slots, name_idx) in summary.items():
+            entry = totals.get(id_idx)
+            if entry is None:
+                entry = totals[id_idx] = [0, 0, 0]
+            entry[0] += sign * count
+            entry[1] += sign * slots
+            entry[2] += sign
+            if sign > 0:
+                self.names[id_idx] = name_idx
+            elif entry[1] == 0:
+                del totals[id_idx]
+            changed.add(id_idx)
+
+    def update(self, blocks):
+        # blocks: [(key, vault_idx, items)]; trả về tập id_idx có tổng thay đổi
+        changed = set()
+        new_blocks = {}
+        for key, _, items in blocks:
+            old = self._blocks.get(key)
+            if old is not None and old[0] is items:
+                new_blocks[key] = old
+                continue
+            if old is not None:
+                self._apply(old[1], -1, changed)
+            summary = self._summarize(items)
+            self._apply(summary, 1, changed)
+            new_blocks[key] = (items, summary)
+        for key, old in self._blocks.items():
+            if key not in new_blocks:
+                self._apply(old[1], -1, changed)
+        self._blocks = new_blocks
+        for id_idx in changed:
+            if id_idx not in self.totals:
+                self.names.pop(id_idx, None)
+        return changed
+
+# --- CACHE THEO TỪNG FILE VAULT ---
+# Mỗi file vault được nhớ theo (path, mtime, size): chỉ file nào đổi/bị xoá
+# mới phải parse lại, các vault khác dùng lại nguyên các dòng đã parse.
+class VaultSnapshot:
+    __slots__ = ("path", "vault_name", "mtime", "size", "items", "error", "incomplete", "digest")
+
+    def __init__(self, path, vault_name, mtime, size, items, error=None, incomplete=False, digest=None):
+        self.path = path
+        self.vault_name = vault_name
+        self.mtime = mtime
+        self.size = size
+        self.items = items
+        self.error = error
+        self.incomplete = incomplete  # File đang được mod ghi dở
+        self.digest = digest  # blake2b của nội dung file (None nếu parse dạng stream)
+
+def vault_name_from_file(file_name):
+    return file_name.replace(".json", "").capitalize()
+
+# --- TẬP THƯ MỤC THEO DÕI ---
+# Nhiều instance game, mỗi instance một thư mục vault-logs: theo dõi đệ quy
+# tất cả qua một pipeline. Khi có hơn một thư mục gốc, tên vault được thêm
+# tiền tố tên thư mục gốc (và thư mục con) để không trùng nhau.
+class WatchSet:
+    def __init__(self, roots, include=("*.json",), exclude=(), recursive=True):
+        self.roots = tuple(dict.fromkeys(os.path.normpath(os.path.abspath(r)) for r in roots if r))
+        self.include = tuple(include) or ("*.json",)
+        self.exclude = tuple(exclude)
+        self.recursive = recursive
+        self._prefixes = [(os.path.normcase(r) + os.sep, r) for r in self.roots]
+        # Thư mục gốc dài nhất trước để thư mục lồng nhau khớp đúng gốc
+        self._prefixes.sort(key=lambda p: -len(p[0]))
+        # Nhãn ngắn nhất phân biệt được các gốc ("instA/vault-logs" thay vì "vault-logs")
+        self._labels = {}
+        depth = 1
+        while len(self._labels) < len(self.roots):
+            labels = {r: "/".join(r.replace("\\", "/").split("/")[-depth:]) for r in self.roots}
+            if len(set(labels.values())) == len(labels) or depth > 64:
+                self._labels = labels
+            depth += 1
+
+    def root_of(self, path):
+        norm = os.path.normcase(os.path.normpath(path))
+        for prefix, root in self._prefixes:
+            if norm.startswith(prefix):
+                return root
+        return None
+
+    def _relative(self, path, root):
+        return os.path.relpath(path, root).replace(os.sep, "/")
+
+    def _excluded(self, name, rel):
+        return any(fnmatch.fnmatch(name, p) or fnmatch.fnmatch(rel, p) for p in self.exclude)
+
+    def matches(self, path):
+        root = self.root_of(path)
+        if root is None:
+            return False
+        rel = self._relative(path, root)
+        if not self.recursive and "/" in rel:
+            return False
+        name = os.path.basename(path)
+        if not any(fnmatch.fnmatch(name, p) or fnmatch.fnmatch(rel, p) for p in self.include):
+            return False
+        return not self._excluded(name, rel)
+
+    def scan(self):
+        return (entry.path for entry in self.scan_entries())
+
+    def scan_entries(self):
+        # Liệt kê mọi file khớp bộ lọc; thư mục bị exclude không được duyệt vào
+        seen = set()
+        for root in self.roots:
+            stack = [root]
+            while stack:
+                directory = stack.pop()
+                try:
+                    entries = list(os.scandir(directory))
+                except OSError:
+                    continue  # Thư mục gốc chưa tồn tại / vừa bị xoá
+                for entry in entries:
+                    rel = self._relative(entry.path, root)
+                    if entry.is_dir(follow_symlinks=False):
+                        if self.recursive and not self._excluded(entry.name, rel):
+                            stack.append(entry.path)
+                    elif self.matches(entry.path) and self.root_of(entry.path) == root:
+                        key = os.path.normcase(entry.path)
+                        if key not in seen:
+                            seen.add(key)
+                            yield entry
+
+    def vault_name(self, path):
+        root = self.root_of(path) or os.path.dirname(path)
+        parts = self._relative(path, root).split("/")
+        prefix = parts[:-1]
+        if len(self.roots) > 1:
+            prefix.insert(0, self._labels.get(root, os.path.basename(root)))
+        return "/".join(prefix + [vault_name_from_file(parts[-1])])
+
+# --- ĐỌC FILE VAULT CHỊU ĐƯỢC FILE GHI DỞ ---
+# Mod ghi đè thẳng file bằng FileWriter nên watchdog hay báo khi file mới ghi
+# được một nửa. File rỗng / bị cắt cụt ở cuối được coi là "đang ghi": giữ
+# snapshot tốt gần nhất và thử đọc lại sau (backoff), chỉ báo lỗi khi hết lượt.
+STREAM_PARSE_MIN_BYTES = 4 * 1024 * 1024
+READ_RETRY_DELAYS_MS = (100, 250, 500, 1000, 2000)
+
+STREAM_READ_CHUNK = 1024 * 1024
+
+class IncompleteVaultFile(ValueError):
+    pass
+
+class HashingReader:
+    # Bọc file cho ijson: băm nội dung trong lúc stream để file lớn cũng có digest
+    # (cache snapshot trên đĩa và việc dùng lại snapshot cũ đều cần digest)
+    def __init__(self, f):
+        self._f = f
+        self._hash = hashlib.blake2b(digest_size=16)
+
+    def read(self, size=-1):
+        data = self._f.read(size)
+        self._hash.update(data)
+        return data
+
+    def digest(self):
+        # ijson có thể dừng trước khoảng trắng cuối file: băm nốt phần còn lại
+        while self.read(STREAM_READ_CHUNK):
+            pass
+        return self._hash.digest()
+
+def file_digest(f):
+    digest = hashlib.blake2b(digest_size=16)
+    for chunk in iter(lambda: f.read(STREAM_READ_CHUNK), b''):
+        digest.update(chunk)
+    return digest.digest()
+
+# --- JSON BACKEND ---
+# Giải mã nhanh bằng msgspec (decode thẳng vào ItemRecord, không tạo dict
+# trung gian) hoặc orjson nếu có cài, không thì dùng json của stdlib.
+# Mỗi backend trả về 4 cột (slots, counts, ids, names) của một vault.
+def rows_to_columns(rows):
+    slots, counts, ids, names = array('i'), array('i'), [], []
+    for item in rows:
+        slots.append(int(item.get('slot', 0)))
+        counts.append(int(item.get('count', 0)))
+        ids.append(str(item.get('id', '')))
+        names.append(str(item.get('name', '')))
+    return slots, counts, ids, names
+
+class StdlibJsonBackend:
+    name = "json (stdlib)"
+
+    def __init__(self):
+        import json
+        self._json = json
+
+    def loads(self, data):
+        return self._json.loads(data)
+
+    def decode_columns(self, data):
+        try:
+            text = data.decode('utf-8')
+        except UnicodeDecodeError as e:
+            if e.reason == "unexpected end of data":  # Ký tự UTF-8 nhiều byte bị cắt ở cuối
+                raise IncompleteVaultFile(str(e))
+            raise
+        try:
+            rows = self._json.loads(text)
+        except self._json.JSONDecodeError as e:
+            # Hỏng ở cuối dữ liệu = đang ghi dở. Chuỗi bị cắt thì stdlib báo lỗi ở
+            # dấu ngoặc kép mở chứ không phải cuối file, nên xét thêm hai trường hợp đó
+            if (not text[e.pos:].strip() or e.msg.startswith("Unterminated string")
+                    or not text.rstrip().endswith(']')):
+                raise IncompleteVaultFile(e.msg)
+            raise
+        return rows_to_columns(rows)
+
+class OrjsonBackend:
+    name = "orjson"
+
+    def __init__(self):
+        self._orjson = optional_import("orjson")
+
+    def loads(self, data):
+        return self._orjson.loads(data)
+
+    def decode_columns(self, data):
+        try:
+            rows = self._orjson.loads(data)
+        except self._orjson.JSONDecodeError as e:
+            if data and not e.doc:
+                # Lỗi UTF-8 (orjson trả doc rỗng): chỉ coi là ghi dở khi ký tự bị cắt ở cuối
+                try:
+                    data.decode('utf-8')
+                except UnicodeDecodeError as u:
+                    if u.reason == "unexpected end of data":
+                        raise IncompleteVaultFile(str(u))
+                raise
+            if e.pos >= len(e.doc):
+                raise IncompleteVaultFile(e.msg)
+            raise
+        return rows_to_columns(rows)
+
+class MsgspecBackend:
+    name = "msgspec"
+
+    def __init__(self):
+        msgspec = optional_import("msgspec")
+
+        class ItemRecord(msgspec.Struct):
+            slot: int = 0
+            id: str = ""
+            name: str = ""
+            count: int = 0
+
+        self._msgspec = msgspec
+        self._items_decoder = msgspec.json.Decoder(list[ItemRecord])
+        self._any_decoder = msgspec.json.Decoder()
+
+    def loads(self, data):
+        return self._any_decoder.decode(data)
+
+    def decode_columns(self, data):
+        msgspec = self._msgspec
+        try:
+            records = self._items_decoder.decode(data)
+        except msgspec.ValidationError:
+            # Sai kiểu (vd. count là chuỗi): decode thường rồi ép kiểu như stdlib
+            try:
+                return rows_to_columns(self._any_decoder.decode(data))
+            except msgspec.DecodeError as e:
+                if "truncated" in str(e):
+                    raise IncompleteVaultFile(str(e))
+                raise
+        except msgspec.DecodeError as e:
+            if "truncated" in str(e):
+                raise IncompleteVaultFile(str(e))
+            raise
+        return (array('i', [r.slot for r in records]), array('i', [r.count for r in records]),
+                [r.id for r in records], [r.name for r in records])
+
+def select_json_backend():
+    if optional_import("msgspec") is not None:
+        return MsgspecBackend()
+    if optional_import("orjson") is not None:
+        return OrjsonBackend()
+    return StdlibJsonBackend()
+
+_json_backend = None
+
+def get_json_backend():
+    # Chọn backend ở lần decode đầu tiên, không phải lúc import module
+    global _json_backend
+    if _json_backend is None:
+        _json_backend = select_json_backend()
+    return _json_backend
+
+def __getattr__(name):
+    # Tương thích với code cũ dùng vault_engine.JSON_BACKEND
+    if name == "JSON_BACKEND":
+        return get_json_backend()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def build_vault_items(columns, store):
+    slots, counts, ids, names = columns
+    id_idx = store.ids.intern_many(ids)
+    name_idx = store.names.intern_many(names)
+    if any(slots[k] > slots[k + 1] for k in range(len(slots) - 1)):
+        order = sorted(range(len(slots)), key=slots.__getitem__)
+        slots = array('i', [slots[k] for k in order])
+        counts = array('i', [counts[k] for k in order])
+        id_idx = array('i', [id_idx[k] for k in order])
+        name_idx = array('i', [name_idx[k] for k in order])
+    return VaultItems(slots, counts, id_idx, name_idx)
+
+def parse_vault_file(file_path, vault_name, mtime, size, store, known=None):
+    if not PROFILER.enabled:
+        return _parse_vault_file(file_path, vault_name, mtime, size, store, known)
+    with PROFILER.span("parse", {"file": os.path.basename(file_path), "bytes": size}):
+        PROFILER.count("files.parsed")
+        return _parse_vault_file(file_path, vault_name, mtime, size, store, known)
+
+def _parse_vault_file(file_path, vault_name, mtime, size, store, known=None):
+    # known: snapshot cũ của cùng file; nội dung không đổi (cùng digest) thì
+    # dùng lại luôn các cột đã decode, không phải parse lại.
+    try:
+        if size == 0:
+            raise IncompleteVaultFile("File rỗng")
+        with open(file_path, 'rb') as f:
+            ijson = optional_import("ijson") if size >= STREAM_PARSE_MIN_BYTES else None
+            if ijson is not None:
+                if known is not None and known.digest is not None and not known.error:
+                    # Băm trước (rẻ hơn parse nhiều): nội dung không đổi thì khỏi stream
+                    digest = file_digest(f)
+                    if digest == known.digest:
+                        return VaultSnapshot(file_path, vault_name, mtime, size, known.items, digest=digest)
+                    f.seek(0)
+                # Stream từng object, không giữ toàn bộ nội dung file trong bộ nhớ
+                reader = HashingReader(f)
+                try:
+                    items = build_vault_items(rows_to_columns(ijson.items(reader, 'item')), store)
+                except ijson.IncompleteJSONError as e:
+                    raise IncompleteVaultFile(str(e).splitlines()[0])
+                return VaultSnapshot(file_path, vault_name, mtime, size, items, digest=reader.digest())
+
+            data = f.read()
+        digest = hashlib.blake2b(data, digest_size=16).digest()
+        if known is not None and known.digest == digest and not known.error:
+            return VaultSnapshot(file_path, vault_name, mtime, size, known.items, digest=digest)
+        items = build_vault_items(get_json_backend().decode_columns(data), store)
+        return VaultSnapshot(file_path, vault_name, mtime, size, items, digest=digest)
+    except IncompleteVaultFile as e:
+        return VaultSnapshot(file_path, vault_name, mtime, size, VaultItems(),
+                             f"File chưa ghi xong: {e}", incomplete=True)
+    except Exception as e:
+        return VaultSnapshot(file_path, vault_name, mtime, size, VaultItems(), str(e))
+
+# --- CACHE SNAPSHOT TRÊN ĐĨA ---
+# Lưu các vault đã decode cạnh config.json để lần mở app sau chỉ parse lại
+# những file đã đổi. Định dạng marshal: bảng chuỗi id/tên dùng chung + các
+# cột int32 dạng bytes của từng file, kèm (mtime, size, digest) để đối chiếu.
+SNAPSHOT_CACHE_VERSION = 1
+
+def _remap_strings(indices, table, mapping, strings):
+    out = array('i')
+    for k in indices:
+        m = mapping.get(k)
+        if m is None:
+            m = mapping[k] = len(strings)
+            strings.append(table.strings[k])
+        out.append(m)
+    return out
+
+def save_snapshot_cache(cache_path, snapshots, store):
+    id_strings, name_strings = [], []
+    id_map, name_map = {}, {}
+    entries = []
+    for snap in snapshots:
+        if snap.error or snap.digest is None:
+            continue
+        items = snap.items
+        entries.append((
+            snap.path, snap.vault_name, snap.mtime, snap.size, snap.digest,
+            items.slots.tobytes(), items.counts.tobytes(),
+            _remap_strings(items.ids, store.ids, id_map, id_strings).tobytes(),
+            _remap_strings(items.names, store.names, name_map, name_strings).tobytes(),
+        ))
+
+    tmp_path = cache_path + ".tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            marshal.dump((SNAPSHOT_CACHE_VERSION, id_strings, name_strings, entries), f)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        print(f"Lỗi lưu cache snapshot: {e}")
+
+def load_snapshot_cache(cache_path, store):
+    # Trả về {key: VaultSnapshot}; file hỏng / khác phiên bản thì bỏ qua
+    try:
+        with open(cache_path, 'rb') as f:
+            version, id_strings, name_strings, entries = marshal.load(f)
+    except (OSError, EOFError, ValueError, TypeError):
+        return {}
+    if version != SNAPSHOT_CACHE_VERSION:
+        return {}
+
+    id_map = store.ids.intern_many(id_strings)
+    name_map = store.names.intern_many(name_strings)
+    snapshots = {}
+    for path, vault_name, mtime, size, digest, slot_bytes, count_bytes, id_bytes, name_bytes in entries:
+        slots, counts, ids, names = array('i'), array('i'), array('i'), array('i')
+        slots.frombytes(slot_bytes)
+        counts.frombytes(count_bytes)
+        ids.frombytes(id_bytes)
+        names.frombytes(name_bytes)
+        items = VaultItems(slots, counts,
+                           array('i', [id_map[k] for k in ids]),
+                           array('i', [name_map[k] for k in names]))
+        snapshots[os.path.normcase(path)] = VaultSnapshot(path, vault_name, mtime, size, items, digest=digest)
+    return snapshots
+
+# --- CSDL SQLITE (TUỲ CHỌN) ---
+# Bật bằng "storage": "sqlite" trong config.json. Snapshot của từng vault được
+# upsert vào bảng items (index theo vault, id, tên + bảng FTS5 trigram cho tìm
+# kiếm); bảng hiển thị nạp dòng theo trang thay vì giữ toàn bộ trong bộ nhớ.
+# Giới hạn: chỉ bảng hiển thị là phân trang. Cache file (VaultFileCache), chỉ
+# mục tìm kiếm, bảng tổng (ItemAggregator) và nhật ký vẫn giữ các cột int32 của
+# mọi vault trong RAM (vài chục byte mỗi ô), nên bộ nhớ vẫn tăng theo số vault.
+# Mỗi thread dùng một InventoryDatabase (connection) riêng.
+SQLITE_SORT_COLUMNS = ("vault", "slot", "count", "name")
+
+class InventoryDatabase:
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.has_fts = False
+        self._conn = None
+        self._synced = {}  # key -> (vault_name, items) đã ghi xuống CSDL
+        self._synced_once = False
+
+    def _connect(self):
+        if self._conn is None:
+            import sqlite3
+            conn = sqlite3.connect(self.db_path)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS items (
+                    vault TEXT NOT NULL,
+                    slot INTEGER NOT NULL,
+                    item_id TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    count INTEGER NOT NULL,
+                    UNIQUE (vault, slot)
+                );
+                CREATE INDEX IF NOT EXISTS idx_items_item_id ON items(item_id);
+                CREATE INDEX IF NOT EXISTS idx_items_name ON items(name);
+            """)
+            try:
+                conn.executescript("""
+                    CREATE VIRTUAL TABLE IF NOT EXISTS items_fts USING fts5(
+                        name, item_id, content='items', content_rowid='rowid', tokenize='trigram');
+                    CREATE TRIGGER IF NOT EXISTS items_ai AFTER INSERT ON items BEGIN
+                        INSERT INTO items_fts(rowid, name, item_id) VALUES (new.rowid, new.name, new.item_id);
+                    END;
+                    CREATE TRIGGER IF NOT EXISTS items_ad AFTER DELETE ON items BEGIN
+                        INSERT INTO items_fts(items_fts, rowid, name, item_id)
+                        VALUES ('delete', old.rowid, old.name, old.item_id);
+                    END;
+                    CREATE TRIGGER IF NOT EXISTS items_au AFTER UPDATE ON items BEGIN
+                        INSERT INTO items_fts(items_fts, rowid, name, item_id)
+                        VALUES ('delete', old.rowid, old.name, old.item_id);
+                        INSERT INTO items_fts(rowid, name, item_id) VALUES (new.rowid, new.name, new.item_id);
+                    END;
+                """)
+                self.has_fts = True
+            except sqlite3.OperationalError:
+                self.has_fts = False  # SQLite không có FTS5/trigram: tìm bằng LIKE
+            self._conn = conn
+        return self._conn
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    # --- Ghi (loader thread) ---
+    def sync_snapshots(self, snapshots, store):
+        conn = self._connect()
+        current = {}
+        with conn:
+            if not self._synced_once:
+                # Lần đầu: dọn các vault còn sót từ lần chạy trước
+                names = {snap.vault_name for snap in snapshots}
+                for (vault,) in conn.execute("SELECT DISTINCT vault FROM items").fetchall():
+                    if vault not in names:
+                        conn.execute("DELETE FROM items WHERE vault = ?", (vault,))
+                self._synced_once = True
+
+            for snap in snapshots:
+                key = os.path.normcase(snap.path)
+                current[key] = (snap.vault_name, snap.items)
+                synced = self._synced.get(key)
+                if synced is None or synced[1] is not snap.items:
+                    self._upsert_vault(conn, snap.vault_name, snap.items, store)
+
+            for key, (vault, _) in self._synced.items():
+                if key not in current:
+                    conn.execute("DELETE FROM items WHERE vault = ?", (vault,))
+        self._synced = current
+
+    def _upsert_vault(self, conn, vault, items, store):
+        existing = {slot for (slot,) in conn.execute("SELECT slot FROM items WHERE vault = ?", (vault,))}
+        stale = existing.difference(items.slots)
+        if stale:
+            conn.executemany("DELETE FROM items WHERE vault = ? AND slot = ?", [(vault, s) for s in stale])
+        ids, names = store.ids.strings, store.names.strings
+        conn.executemany("""
+            INSERT INTO items (vault, slot, item_id, name, count) VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (vault, slot) DO UPDATE SET
+                item_id = excluded.item_id, name = excluded.name, count = excluded.count
+            WHERE item_id IS NOT excluded.item_id OR name IS NOT excluded.name OR count IS NOT excluded.count
+        """, [(vault, items.slots[k], ids[items.ids[k]], names[items.names[k]], items.counts[k])
+              for k in range(len(items))])
+
+    # --- Đọc (GUI thread) ---
+    def _where(self, vault, text):
+        clauses, params = [], []
+        if vault:
+            clauses.append("vault = ?")
+            params.append(vault)
+        if text:
+            self._connect()
+            if self.has_fts and len(text) >= 3:
+                clauses.append("rowid IN (SELECT rowid FROM items_fts WHERE items_fts MATCH ?)")
+                params.append('"' + text.replace('"', '""') + '"')
+            else:
+                like = "%" + text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+                clauses.append("(lower(name) LIKE ? ESCAPE '\\' OR lower(item_id) LIKE ? ESCAPE '\\')")
+                params += [like, like]
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def count(self, vault="", text=""):
+        where, params = self._where(vault, text)
+        return self._connect().execute(f"SELECT COUNT(*) FROM items{where}", params).fetchone()[0]
+
+    def fetch(self, vault, text, sort_column, descending, offset, limit):
+        where, params = self._where(vault, text)
+        direction = "DESC" if descending else "ASC"
+        order = f"{SQLITE_SORT_COLUMNS[sort_column]} {direction}, vault, slot" if sort_column >= 0 else "vault, slot"
+        return self._connect().execute(
+            f"SELECT vault, slot, count, name FROM items{where} ORDER BY {order} LIMIT ? OFFSET ?",
+            params + [limit, offset]).fetchall()
+
+class VaultFileCache:
+    def __init__(self, store):
+        self.store = store
+        self._entries = {}
+        self._attempts = {}  # key -> số lần liên tiếp đọc phải file ghi dở
+        self.dirty = False   # Có thay đổi chưa ghi xuống cache trên đĩa
+        self._scanned = None # WatchSet đã được quét đầy đủ gần nhất
+
+    def clear(self):
+        self._entries.clear()
+        self._attempts.clear()
+        self._scanned = None
+
+    def pending_paths(self):
+        # Các file đang chờ đọc lại vì còn ghi dở
+        return list(self._attempts)
+
+    def load_persisted(self, cache_path):
+        self._entries.update(load_snapshot_cache(cache_path, self.store))
+
+    def save_persisted(self, cache_path):
+        save_snapshot_cache(cache_path, list(self._entries.values()), self.store)
+        self.dirty = False
+
+    def next_retry_delay(self):
+        # Thời gian chờ (ms) trước lần đọc lại kế tiếp, None nếu không cần
+        if not self._attempts:
+            return None
+        return READ_RETRY_DELAYS_MS[min(self._attempts.values()) - 1]
+
+    def _store_result(self, key, snap):
+        if snap.incomplete:
+            attempts = self._attempts.get(key, 0) + 1
+            if attempts <= len(READ_RETRY_DELAYS_MS):
+                self._attempts[key] = attempts
+                good = self._entries.get(key)
+                if good is None or good.error:
+                    self._entries[key] = snap
+                # Ngược lại giữ nguyên snapshot tốt gần nhất
+                return
+            snap.incomplete = False  # Hết lượt thử: báo lỗi như file hỏng
+        self._attempts.pop(key, None)
+        if self._entries.get(key) is not snap:
+            self._entries[key] = snap
+            self.dirty = True
+
+    def _needs_rescan(self, watch, forced):
+        # Sự kiện của thư mục (xoá / đổi tên cả thư mục) không cho biết file nào bị ảnh hưởng
+        for path in forced:
+            if path in self._entries or watch.matches(path):
+                continue
+            if os.path.isdir(path) or any(key.startswith(path + os.sep) for key in self._entries):
+                return True
+        return False
+
+    def _original_path(self, key, path):
+        # Đường dẫn đã bị normcase (vd. từ PollingWatcher) không còn hoa/thường:
+        # lấy lại từ snapshot đã có của cùng file
+        cached = self._entries.get(key)
+        if path == key and cached is not None:
+            return cached.path
+        return path
+
+    def refresh(self, watch, changed_paths=None, pool=None, is_stale=None, rescan=True):
+        # Trả về danh sách snapshot (sắp theo đường dẫn) của các thư mục theo dõi,
+        # hoặc None nếu is_stale() báo đã có yêu cầu mới hơn (huỷ giữa chừng).
+        # changed_paths: các file watchdog báo đổi/tạo/xoá/đổi tên -> luôn parse lại
+        # kể cả khi mtime/size trùng (mtime trên một số FS chỉ chính xác tới giây).
+        # rescan=False: chỉ stat các file được báo, không quét lại cả cây thư mục.
+        # forced: key (normcase) -> đường dẫn gốc. vault_name() và snap.path phải lấy từ
+        # đường dẫn giữ nguyên hoa/thường, không thì trên Windows "InstA/Vaults1" thành
+        # "insta/Vaults1" sau mỗi sự kiện rồi lại đổi về khi quét đầy đủ.
+        forced = {}
+        for path in changed_paths or ():
+            path = os.path.normpath(path)
+            forced[os.path.normcase(path)] = path
+        if rescan or self._scanned is not watch or self._needs_rescan(watch, forced):
+            candidates = list(watch.scan())
+            listing = set()
+            self._scanned = watch
+        else:
+            candidates = [self._original_path(key, path) for key, path in forced.items()
+                          if watch.matches(path)]
+            candidates.extend(self._original_path(key, key) for key in self._attempts if key not in forced)
+            listing = set(self._entries)
+        to_parse = []
+
+        for file_path in candidates:
+            key = os.path.normcase(file_path)
+            try:
+                st = os.stat(file_path)
+            except OSError:
+                listing.discard(key)  # File đã bị xoá / đổi tên đi
+                continue
+
+            listing.add(key)
+            cached = self._entries.get(key)
+            vault_name = watch.vault_name(file_path)
+            if (cached is None or key in forced or key in self._attempts
+                    or cached.mtime != st.st_mtime_ns or cached.size != st.st_size
+                    or cached.vault_name != vault_name):
+                to_parse.append((key, file_path, vault_name, st.st_mtime_ns, st.st_size,
+                                 self.store, cached))
+
+        if pool is None or len(to_parse) < 2:
+            for key, *args in to_parse:
+                if is_stale and is_stale():
+                    return None
+                self._store_result(key, parse_vault_file(*args))
+        else:
+            from concurrent.futures import as_completed
+            futures = {pool.submit(parse_vault_file, *args): key for key, *args in to_parse}
+            for fut in as_completed(futures):
+                if is_stale and is_stale():
+                    for f in futures:
+                        f.cancel()
+                    return None
+                self._store_result(futures[fut], fut.result())
+
+        # Bỏ các vault có file đã bị xoá khỏi cache
+        for key in [k for k in self._entries if k not in listing]:
+            del self._entries[key]
+            self._attempts.pop(key, None)
+            self.dirty = True
+
+        return [self._entries[key] for key in sorted(listing) if key in self._entries]
+
+# --- NHẬT KÝ THAY ĐỔI (LỊCH SỬ) ---
+# Mỗi lần một vault đổi, các ô (vault, slot) bị đổi được ghi thành sự kiện
+# "đặt" (id, tên, số lượng) hoặc "xoá". Sự kiện gom thành segment: cột hoá,
+# timestamp mã hoá delta, nén zlib. Định kỳ ghi checkpoint toàn bộ tồn kho để
+# truy vấn "tồn kho tại thời điểm T" chỉ cần checkpoint gần nhất + các segment
+# sau nó, không phải phát lại từ đầu.
+# Giữ lại retention_days ngày: mỗi khi ghi checkpoint, xoá mọi checkpoint/segment
+# cũ hơn checkpoint mới nhất nằm trước mốc cắt (checkpoint đó được giữ làm gốc
+# nên truy vấn trong khoảng lưu giữ vẫn đủ dữ liệu).
+HISTORY_VERSION = 1
+HISTORY_SEGMENT_EVENTS = 512
+HISTORY_SEGMENT_MAX_AGE_MS = 60_000
+HISTORY_CHECKPOINT_EVENTS = 5000
+HISTORY_RETENTION_DAYS = 30
+
+def _history_columns(rows):
+    # rows: [(vault, slot, item_id, name, count)]; item_id None = ô bị xoá
+    strings, string_ids = [], {}
+
+    def intern(text):
+        idx = string_ids.get(text)
+        if idx is None:
+            idx = string_ids[text] = len(strings)
+            strings.append(text)
+        return idx
+
+    vaults, slots, ids, names, counts = array('i'), array('i'), array('i'), array('i'), array('i')
+    for vault, slot, item_id, name, count in rows:
+        vaults.append(intern(vault))
+        slots.append(slot)
+        ids.append(-1 if item_id is None else intern(item_id))
+        names.append(-1 if name is None else intern(name))
+        counts.append(count)
+    return strings, vaults.tobytes(), slots.tobytes(), ids.tobytes(), names.tobytes(), counts.tobytes()
+
+def _history_rows(strings, *column_bytes):
+    vaults, slots, ids, names, counts = (array('i') for _ in range(5))
+    for arr, data in zip((vaults, slots, ids, names, counts), column_bytes):
+        arr.frombytes(data)
+    for k in range(len(slots)):
+        yield (strings[vaults[k]], slots[k],
+               None if ids[k] < 0 else strings[ids[k]],
+               None if names[k] < 0 else strings[names[k]],
+               counts[k])
+
+class ChangeJournal:
+    def __init__(self, history_dir, retention_days=HISTORY_RETENTION_DAYS):
+        self.history_dir = history_dir
+        self.retention_days = retention_days  # None/0 = giữ mãi
+        self._lock = threading.Lock()  # record() chạy trên loader thread, truy vấn trên GUI thread
+        self._pending = []             # [(ts, vault, slot, item_id, name, count)]
+        self._blocks = None            # key -> (vault_name, items); None = chưa ghi lần nào trong phiên
+        self._events_since_checkpoint = 0
+        self._last_checkpoint_ts = 0
+
+    def _files(self, prefix):
+        # [(ts đầu, ts cuối, đường dẫn)] sắp theo thời gian
+        try:
+            names = os.listdir(self.history_dir)
+        except OSError:
+            return []
+        files = []
+        for name in names:
+            if name.startswith(prefix) and name.endswith(".bin"):
+                parts = name[len(prefix):-4].split("-")
+                try:
+                    first, last = int(parts[0]), int(parts[-1])
+                except ValueError:
+                    continue
+                files.append((first, last, os.path.join(self.history_dir, name)))
+        files.sort()
+        return files
+
+    def _read(self, path):
+        # File hỏng / cắt cụt (zlib.error, EOFError của marshal...) đều quy về ValueError
+        with open(path, 'rb') as f:
+            data = f.read()
+        try:
+            payload = marshal.loads(zlib.decompress(data))
+        except (zlib.error, EOFError, TypeError, ValueError) as e:
+            raise ValueError(f"File lịch sử hỏng: {path} ({e})") from e
+        if not isinstance(payload, tuple) or not payload or payload[0] != HISTORY_VERSION:
+            raise ValueError(f"Phiên bản lịch sử không hỗ trợ: {path}")
+        return payload
+
+    def _write(self, name, payload):
+        os.makedirs(self.history_dir, exist_ok=True)
+        path = os.path.join(self.history_dir, name)
+        with open(path + ".tmp", 'wb') as f:
+            f.write(zlib.compress(marshal.dumps(payload), 6))
+        os.replace(path + ".tmp", path)
+
+    # --- Ghi ---
+    def record(self, snapshots, store, now_ms=None):
+        now = max(now_ms or int(time.time() * 1000), self._last_checkpoint_ts + 1)
+        with self._lock:
+            previous = self._blocks or {}
+            current = {}
+            for snap in snapshots:
+                key = os.path.normcase(snap.path)
+                if snap.error:
+                    # File lỗi/đang ghi: giữ nguyên trạng thái cũ, không coi là vault bị xoá sạch
+                    if key in previous:
+                        current[key] = previous[key]
+                    continue
+                current[key] = (snap.vault_name, snap.items)
+
+            if self._blocks is None:
+                # Đầu phiên: so với trạng thái cuối cùng đã lưu rồi ghi checkpoint mới
+                checkpoints = self._files("ckpt-")
+                if checkpoints:
+                    now = max(now, checkpoints[-1][0] + 1)
+                    self._diff_state(self._state_at_locked(now), current, store, now)
+                self._blocks = current
+                self._flush_locked()
+                self._write_checkpoint(current, store, now)
+                return
+
+            for key, (vault, items) in current.items():
+                old = previous.get(key)
+                if old is None:
+                    self._diff_items(vault, None, items, store, now)
+                elif old[1] is not items:
+                    self._diff_items(vault, old[1], items, store, now)
+            for key, (vault, items) in previous.items():
+                if key not in current:
+                    self._diff_items(vault, items, None, store, now)
+            self._blocks = current
+
+            if (len(self._pending) >= HISTORY_SEGMENT_EVENTS
+                    or (self._pending and now - self._pending[0][0] >= HISTORY_SEGMENT_MAX_AGE_MS)):
+                self._flush_locked()
+            if self._events_since_checkpoint >= HISTORY_CHECKPOINT_EVENTS:
+                self._flush_locked()
+                self._write_checkpoint(current, store, now)
+
+    def _emit(self, event):
+        self._pending.append(event)
+        self._events_since_checkpoint += 1
+
+    def _diff_items(self, vault, old, new, store, now):
+        # Merge theo slot như VaultTableModel._diff_block
+        ids, names = store.ids.strings, store.names.strings
+        n_old = len(old) if old is not None else 0
+        n_new = len(new) if new is not None else 0
+        i = j = 0
+        while i < n_old or j < n_new:
+            if i < n_old and j < n_new and old.slots[i] == new.slots[j]:
+                if (old.counts[i] != new.counts[j] or old.ids[i] != new.ids[j]
+                        or old.names[i] != new.names[j]):
+                    self._emit((now, vault, new.slots[j], ids[new.ids[j]], names[new.names[j]], new.counts[j]))
+                i += 1
+                j += 1
+            elif j >= n_new or (i < n_old and old.slots[i] < new.slots[j]):
+                self._emit((now, vault, old.slots[i], None, None, 0))
+                i += 1
+            else:
+                self._emit((now, vault, new.slots[j], ids[new.ids[j]], names[new.names[j]], new.counts[j]))
+                j += 1
+
+    def _diff_state(self, state, current, store, now):
+        ids, names = store.ids.strings, store.names.strings
+        seen = set()
+        for vault, items in current.values():
+            for k in range(len(items)):
+                key = (vault, items.slots[k])
+                seen.add(key)
+                row = (ids[items.ids[k]], names[items.names[k]], items.counts[k])
+                if state.get(key) != row:
+                    self._emit((now, vault, items.slots[k]) + row)
+        for vault, slot in state:
+            if (vault, slot) not in seen:
+                self._emit((now, vault, slot, None, None, 0))
+
+    def _flush_locked(self):
+        if not self._pending:
+            return
+        events = self._pending
+        timestamps = array('q')
+        prev = events[0][0]
+        for event in events:
+            timestamps.append(event[0] - prev)
+            prev = event[0]
+        columns = _history_columns(event[1:] for event in events)
+        self._write(f"seg-{events[0][0]:013d}-{events[-1][0]:013d}.bin",
+                    (HISTORY_VERSION, events[0][0], timestamps.tobytes()) + columns)
+        self._pending = []
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _write_checkpoint(self, blocks, store, now):
+        ids, names = store.ids.strings, store.names.strings
+        rows = [(vault, items.slots[k], ids[items.ids[k]], names[items.names[k]], items.counts[k])
+                for vault, items in blocks.values() for k in range(len(items))]
+        self._write(f"ckpt-{now:013d}.bin", (HISTORY_VERSION, now) + _history_columns(rows))
+        self._events_since_checkpoint = 0
+        self._last_checkpoint_ts = now
+        self._prune(now)
+
+    def _prune(self, now):
+        if not self.retention_days:
+            return
+        cutoff = now - int(self.retention_days * 86_400_000)
+        checkpoints = self._files("ckpt-")
+        bases = [first for first, _, _ in checkpoints if first <= cutoff]
+        if not bases:
+            return
+        base = bases[-1]
+        stale = [path for first, _, path in checkpoints if first < base]
+        stale += [path for _, last, path in self._files("seg-") if last <= base]
+        for path in stale:
+            try:
+                os.remove(path)
+            except OSError as e:
+                print(f"Lỗi xoá lịch sử cũ {path}: {e}")
+
+    # --- Truy vấn ---
+    def _segment_events(self, path):
+        _, base, ts_bytes, *columns = self._read(path)
+        deltas = array('q')
+        deltas.frombytes(ts_bytes)
+        ts = base
+        events = []
+        for delta, row in zip(deltas, _history_rows(*columns)):
+            ts += delta
+            events.append((ts,) + row)
+        return events
+
+    def _load_checkpoint(self, path):
+        _, _, *columns = self._read(path)
+        return {(vault, slot): (item_id, name, count)
+                for vault, slot, item_id, name, count in _history_rows(*columns)}
+
+    def _state_at_locked(self, ts):
+        # File hỏng bị bỏ qua: checkpoint hỏng thì lùi về checkpoint trước đó,
+        # segment hỏng thì thiếu đúng các sự kiện của nó
+        state = None
+        for base, _, path in reversed([c for c in self._files("ckpt-") if c[0] <= ts]):
+            try:
+                state = self._load_checkpoint(path)
+                break
+            except (OSError, ValueError, TypeError, IndexError) as e:
+                print(f"Bỏ qua checkpoint lịch sử: {e}")
+        if state is None:
+            return {}  # Trước checkpoint đầu tiên (đọc được): chưa có lịch sử
+
+        def apply(event):
+            _, vault, slot, item_id, name, count = event
+            if item_id is None:
+                state.pop((vault, slot), None)
+            else:
+                state[(vault, slot)] = (item_id, name, count)
+
+        for first, last, path in self._files("seg-"):
+            if last <= base or first > ts:
+                continue
+            try:
+                events = self._segment_events(path)
+            except (OSError, ValueError, TypeError, IndexError) as e:
+                print(f"Bỏ qua segment lịch sử: {e}")
+                continue
+            for event in events:
+                if base < event[0] <= ts:
+                    apply(event)
+        for event in self._pending:
+            if base < event[0] <= ts:
+                apply(event)
+        return state
+
+    def state_at(self, ts_ms):
+        # {(vault, slot): (item_id, name, count)} tại thời điểm ts_ms
+        with self._lock:
+            return self._state_at_locked(ts_ms)
+
+    def net_change(self, since_ms, until_ms=None):
+        # [(item_id, name, chênh lệch)] giữa hai thời điểm, chênh lệch lớn nhất trước
+        until_ms = until_ms or int(time.time() * 1000)
+        totals = {}
+        for sign, state in ((-1, self.state_at(since_ms)), (1, self.state_at(until_ms))):
+            for item_id, name, count in state.values():
+                entry = totals.setdefault(item_id, [name, 0])
+                entry[1] += sign * count
+                if sign > 0:
+                    entry[0] = name
+        changes = [(item_id, name, delta) for item_id, (name, delta) in totals.items() if delta]
+        changes.sort(key=lambda c: -abs(c[2]))
+        return changes
+
+# --- VAULT ENGINE: API DÙNG CHUNG ---
+# Gói store + cache file + chỉ mục tìm kiếm + tổng theo vật phẩm (+ nhật ký,
+# CSDL, cache trên đĩa nếu được gắn). Không phụ thuộc Qt và không tự tạo
+# thread ngoài pool parse: lớp gọi (loader của GUI, CLI, benchmark) quyết định
+# chạy trên thread nào. Mọi hàm ghi phải được gọi từ cùng một thread.
+class VaultEngine:
+    def __init__(self, store=None, persist_path="", journal=None, database=None, max_workers=None):
+        self.store = store if store is not None else ItemStore()
+        self.cache = VaultFileCache(self.store)
+        self.index = SearchIndex(self.store)
+        self.persist_path = persist_path  # File cache snapshot trên đĩa, "" = tắt
+        self.journal = journal            # ChangeJournal, None = không ghi lịch sử
+        self.database = database          # InventoryDatabase, None = không dùng SQLite
+        self.snapshots = []
+        self._aggregator = None
+        self._persist_loaded = False
+        self._max_workers = max_workers or min(8, os.cpu_count() or 2)
+        self._pool = None
+
+    @property
+    def pool(self):
+        if self._pool is None:
+            from concurrent.futures import ThreadPoolExecutor
+            self._pool = ThreadPoolExecutor(max_workers=self._max_workers, thread_name_prefix="vault-parse")
+        return self._pool
+
+    def prepare(self, full=False):
+        # F5 bỏ toàn bộ cache; lần đầu tiên nạp cache snapshot từ lần chạy trước
+        if full:
+            self.cache.clear()
+        elif self.persist_path and not self._persist_loaded:
+            self.cache.load_persisted(self.persist_path)
+        self._persist_loaded = True
+
+    def refresh(self, watch, changed_paths=(), rescan=True, is_stale=None):
+        # Trả về snapshot mới của toàn bộ watch set, None nếu bị huỷ giữa chừng.
+        # Lỗi nhật ký / CSDL không làm hỏng lần nạp (chỉ in ra).
+        with PROFILER.span("cache.refresh", {"rescan": rescan}):
+            snapshots = self.cache.refresh(watch, changed_paths, self.pool, is_stale, rescan)
+        if snapshots is None:
+            return None
+        if self.journal is not None:
+            try:
+                with PROFILER.span("journal.record"):
+                    self.journal.record(snapshots, self.store)
+            except (OSError, ValueError) as e:
+                print(f"Lỗi ghi lịch sử: {e}")
+        if self.database is not None:
+            import sqlite3
+            try:
+                with PROFILER.span("database.sync"):
+                    self.database.sync_snapshots(snapshots, self.store)
+            except sqlite3.Error as e:
+                print(f"Lỗi ghi CSDL: {e}")
+        self.snapshots = snapshots
+        return snapshots
+
+    def load(self, dirs, include=("*.json",), exclude=(), recursive=True):
+        # Nạp trọn một lần (CLI, benchmark)
+        self.prepare()
+        return self.refresh(WatchSet(dirs, include, exclude, recursive))
+
+    def search(self, text):
+        # (id tên khớp, id item khớp) cho chuỗi tìm kiếm
+        return self.index.match(text.lower())
+
+    def totals(self):
+        # {id_idx: [tổng số lượng, số ô, số vault]} của lần nạp gần nhất
+        if self._aggregator is None:
+            self._aggregator = ItemAggregator()
+        self._aggregator.update([(snap.path, 0, snap.items) for snap in self.snapshots if not snap.error])
+        return self._aggregator.totals
+
+    def query(self, search="", vault="", group_by="none"):
+        return query_inventory(self.store, self.snapshots, search, vault, group_by)
+
+    def pending_paths(self):
+        return self.cache.pending_paths()
+
+    def next_retry_delay(self):
+        return self.cache.next_retry_delay()
+
+    @property
+    def dirty(self):
+        return self.cache.dirty
+
+    def save(self):
+        if self.cache.dirty and self.persist_path:
+            self.cache.save_persisted(self.persist_path)
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+        self.save()
+        if self.journal is not None:
+            try:
+                self.journal.flush()
+            except OSError as e:
+                print(f"Lỗi ghi lịch sử: {e}")
+        if self.database is not None:
+            self.database.close()
+
+# --- XUẤT DỮ LIỆU (CLIPBOARD / CSV / JSON / XLSX) ---
+# Các dòng đã được đọc sẵn thành tuple; ghi tuần tự từng dòng (không dựng cả
+# chuỗi / cả list dict trong bộ nhớ), dùng chung cho GUI và dòng lệnh.
+EXPORT_FORMATS = {".csv": "csv", ".json": "json", ".xlsx": "xlsx", ".tsv": "tsv", ".txt": "tsv"}
+
+def format_tsv(columns, rows):
+    # Dạng dán được vào Excel / Google Sheets: tab giữa các cột, một lần join
+    lines = ["\t".join(columns)]
+    lines.extend("\t".join(map(str, row)) for row in rows)
+    lines.append("")
+    return "\n".join(lines)
+
+def write_rows(rows, columns, fmt, out):
+    if fmt == "json":
+        import json
+        dumps = json.dumps
+        sep = "\n  "
+        out.write("[")
+        for row in rows:
+            out.write(sep + dumps(dict(zip(columns, row)), ensure_ascii=False))
+            sep = ",\n  "
+        out.write("\n]\n" if sep != "\n  " else "]\n")
+        return
+    if fmt == "tsv":
+        out.write(format_tsv(columns, rows))
+        return
+    import csv
+    writer = csv.writer(out, lineterminator="\n")
+    writer.writerow(columns)
+    writer.writerows(rows)
+
+def export_file(path, columns, rows, fmt=None, excel_bom=False):
+    # fmt mặc định theo phần mở rộng của file. XLSX cần openpyxl (tuỳ chọn).
+    fmt = fmt or EXPORT_FORMATS.get(os.path.splitext(path)[1].lower(), "csv")
+    if fmt == "xlsx":
+        openpyxl = optional_import("openpyxl")
+        if openpyxl is None:
+            raise RuntimeError("Xuất XLSX cần cài openpyxl (pip install openpyxl)")
+        workbook = openpyxl.Workbook(write_only=True)  # Ghi tuần tự, không giữ ô trong bộ nhớ
+        sheet = workbook.create_sheet("Vault")
+        sheet.append(list(columns))
+        for row in rows:
+            sheet.append(list(row))
+        workbook.save(path)
+        return
+    # excel_bom: để Excel nhận đúng UTF-8 khi mở CSV (tên có ký tự đặc biệt)
+    encoding = "utf-8-sig" if excel_bom and fmt == "csv" else "utf-8"
+    with open(path, 'w', encoding=encoding, newline='') as f:
+        write_rows(rows, columns, fmt, f)
+
+# --- CHẾ ĐỘ DÒNG LỆNH (KHÔNG CẦN QT) ---
+# python VaultInventoryManager.py query --dir <thư mục> [--search diamond]
+#     [--vault Vaults1] [--group-by none|id|vault] [--format csv|json|xlsx]
+QUERY_COLUMNS = {
+    "none": ("vault", "slot", "id", "name", "count"),
+    "id": ("id", "name", "total", "vaults", "slots"),
+    "vault": ("vault", "items", "slots", "total"),
+}
+
+def query_inventory(store, snapshots, search="", vault="", group_by="none"):
+    # Cùng logic lọc với giao diện: khớp chuỗi con (không phân biệt hoa thường)
+    # trên tên hoặc id vật phẩm, giới hạn theo vault nếu có
+    text = search.lower()
+    if text:
+        name_hits, id_hits = SearchIndex(store).match(text)
+    ids, names = store.ids.strings, store.names.strings
+
+    def accept(id_idx, name_idx):
+        return not text or name_idx in name_hits or id_idx in id_hits
+
+    selected = [snap for snap in snapshots
+                if not snap.error and (not vault or snap.vault_name == vault)]
+
+    if group_by == "id":
+        aggregator = ItemAggregator()
+        aggregator.update([(snap.path, 0, snap.items) for snap in selected])
+        rows = [(ids[id_idx], names[aggregator.names[id_idx]], total, vaults, slots)
+                for id_idx, (total, slots, vaults) in aggregator.totals.items()
+                if accept(id_idx, aggregator.names[id_idx])]
+        rows.sort(key=lambda r: (-r[2], r[0]))
+        return rows
+
+    rows = []
+    for snap in sorted(selected, key=lambda s: s.vault_name):
+        items = snap.items
+        matched = [k for k in range(len(items)) if accept(items.ids[k], items.names[k])]
+        if group_by == "vault":
+            if matched:
+                rows.append((snap.vault_name, len({items.ids[k] for k in matched}), len(matched),
+                             sum(items.counts[k] for k in matched)))
+        else:
+            rows.extend((snap.vault_name, items.slots[k], ids[items.ids[k]],
+                         names[items.names[k]], items.counts[k]) for k in matched)
+    return rows
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(prog="VaultInventoryManager.py",
+                                     description="Truy vấn tồn kho vault không cần giao diện.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    query = commands.add_parser("query", help="Lọc / gộp tồn kho và in ra CSV hoặc JSON")
+    query.add_argument("--dir", action="append", required=True,
+                       help="Thư mục vault-logs (lặp lại để gộp nhiều thư mục)")
+    query.add_argument("--search", default="", help="Chuỗi cần tìm trong tên hoặc id vật phẩm")
+    query.add_argument("--vault", default="", help="Chỉ lấy một vault (tên như trong giao diện)")
+    query.add_argument("--group-by", choices=tuple(QUERY_COLUMNS), default="none")
+    query.add_argument("--format", choices=("csv", "json", "xlsx"), default="csv")
+    query.add_argument("--include", action="append", default=None, help="Glob file cần đọc (mặc định *.json)")
+    query.add_argument("--exclude", action="append", default=[], help="Glob file/thư mục bỏ qua")
+    query.add_argument("--no-recursive", action="store_true", help="Không đọc thư mục con")
+    query.add_argument("--cache", default="", help="File cache snapshot để lần chạy sau nhanh hơn")
+    query.add_argument("--output", default="", help="Ghi ra file thay vì stdout")
+    args = parser.parse_args(argv)
+
+    missing = [d for d in args.dir if not os.path.isdir(d)]
+    if missing:
+        parser.error(f"Không tìm thấy thư mục: {', '.join(missing)}")
+    if args.format == "xlsx" and not args.output:
+        parser.error("--format xlsx cần --output")
+
+    engine = VaultEngine(persist_path=args.cache)
+    try:
+        snapshots = engine.load(args.dir, args.include or ("*.json",), args.exclude, not args.no_recursive)
+    finally:
+        engine.close()
+    for snap in snapshots:
+        if snap.error:
+            print(f"Bỏ qua {snap.vault_name}: {snap.error}", file=sys.stderr)
+
+    rows = engine.query(args.search, args.vault, args.group_by)
+    columns = QUERY_COLUMNS[args.group_by]
+    if args.output:
+        try:
+            export_file(args.output, columns, rows, args.format)
+        except RuntimeError as e:
+            parser.error(str(e))
+    else:
+        try:
+            write_rows(rows, columns, args.format, sys.stdout)
+            sys.stdout.flush()
+        except BrokenPipeError:
+            # Bên đọc đã đóng pipe (vd. "| head"): thoát êm, không in traceback. Chuyển
+            # stdout sang devnull để lần flush lúc thoát không báo lỗi lần nữa
+            devnull = os.open(os.devnull, os.O_WRONLY)
+            os.dup2(devnull, sys.stdout.fileno())
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())